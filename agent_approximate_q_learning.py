@@ -1,122 +1,266 @@
+import copy
 import numpy as np
 import random
+import time
 from sklearn.linear_model import LinearRegression
-from chess_board import ChessBoard
+from checkpoint import prefixed, unprefixed
+from episode_engine import default_engine
+from feature_extractor import FEATURE_NAMES, FeatureExtractor
+from replay_buffer import ReplayBuffer
+
+# Modes d'apprentissage disponibles :
+# - "refit" : réentraîne la LinearRegression sur tout l'historique à chaque transition (comportement d'origine)
+# - "td" : descente de semi-gradient TD normalisée, O(caractéristiques) par transition
+# - "rls" : moindres carrés récursifs, O(caractéristiques²) par transition, sans historique
+LEARNERS = ("refit", "td", "rls")
+# Avec replay_capacity, les transitions sont gardées dans une mémoire de rejeu bornée (replay_buffer.py)
+# et chaque transition déclenche une mise à jour sur un minibatch dont les cibles sont recalculées :
+# - "td" : un pas de semi-gradient normalisé moyen sur batch_size transitions tirées au hasard
+# - "refit" : réajustement de la LinearRegression sur toute la mémoire (remplace X et y)
+# "rls" résume déjà tout l'historique dans P et n'utilise pas de mémoire de rejeu
+
 
 class ApproximateQLearningAgent:
-    def __init__(self, alpha=0.1, gamma=0.9, epsilon=0.1):
+    def __init__(self, alpha=0.1, gamma=0.9, epsilon=0.1, learner="refit", replay_capacity=None, batch_size=32,
+                 prioritized=False):
         """Initialisation des paramètres du Q-learning approximatif."""
+        if learner not in LEARNERS:
+            raise ValueError("Learner invalide. Utilisez 'refit', 'td' ou 'rls'.")
+        if replay_capacity and learner == "rls":
+            raise ValueError("Mémoire de rejeu invalide avec 'rls'. Utilisez 'refit' ou 'td'.")
         self.alpha = alpha  # Taux d'apprentissage
         self.gamma = gamma  # Facteur de discount
         self.epsilon = epsilon  # Taux d'exploration
+        self.learner = learner  # Mode de mise à jour du modèle
         self.model = LinearRegression()  # Régression linéaire pour l'approximation des valeurs Q
         self.X = []  # Listes pour stocker les caractéristiques des états-action
         self.y = []  # Liste pour stocker les valeurs Q correspondantes
+        self.weights = None  # Vecteur de poids (biais en dernière position) des modes en ligne
+        self.P = None  # Inverse de la matrice de covariance pour les moindres carrés récursifs
+        self.feature_extractor = FeatureExtractor()  # Caractéristiques calculées sur les bitboards, avec cache
+        self.batch_size = batch_size  # Taille des minibatchs tirés dans la mémoire de rejeu
+        self.replay = ReplayBuffer(replay_capacity, len(FEATURE_NAMES), prioritized=prioritized) if replay_capacity else None
+        self.instrumentation = None  # Instrumentation optionnelle, qui reçoit le temps des réajustements
 
     # Retourne la valeur Q estimée pour un état et une action donnés à l'aide du modèle approximatif
     def get_q_value(self, state, action):
-        features = self.extract_features(state, action)
-        return self.model.predict([features])[0] if self.X else 0
+        return self.get_q_values(state, [action])[0]
+
+    # Retourne les valeurs Q de toutes les actions d'un état en un seul appel vectorisé au modèle
+    def get_q_values(self, state, possible_actions):
+        if not self.is_fitted():
+            return np.zeros(len(possible_actions))
+        return self.predict(self.feature_extractor.extract_batch(state, possible_actions))
+
+    # Valeurs Q des actions de plusieurs états, avec un seul appel au modèle pour tout le lot
+    def get_q_values_batch(self, states, possible_actions_list):
+        sizes = [len(actions) for actions in possible_actions_list]
+        if not self.is_fitted() or not sum(sizes):
+            return [np.zeros(size) for size in sizes]
+        features = np.vstack([self.feature_extractor.extract_batch(state, actions)
+                              for state, actions in zip(states, possible_actions_list) if actions])
+        return np.split(self.predict(features), np.cumsum(sizes)[:-1])
+
+    # Vrai si le modèle a déjà reçu des données d'entraînement
+    def is_fitted(self):
+        if self.learner != "refit":
+            return self.weights is not None
+        return bool(self.X) or hasattr(self.model, "coef_")
+
+    # Valeurs Q d'une matrice de caractéristiques (une ligne par couple état-action)
+    def predict(self, features):
+        if self.learner != "refit":
+            return features @ self.weights[:-1] + self.weights[-1]
+        return self.model.predict(features)
+
+    # Choisit aléatoirement parmi les actions ayant la Q-value maximale
+    def select_best_action(self, possible_actions, q_values):
+        best_indices = np.flatnonzero(q_values == np.max(q_values))
+        return possible_actions[random.choice(best_indices)]
 
     # Choisir une action selon une politique d'exploration/exploitation
     def choose_action(self, state, possible_actions):
         if np.random.rand() < self.epsilon:
             return random.choice(possible_actions)  # Exploration
         else:
-            q_values = [self.get_q_value(state, action) for action in possible_actions]
-            max_q = max(q_values)
-            best_actions = [action for action, q in zip(possible_actions, q_values) if q == max_q]
-            return random.choice(best_actions)  # Si plusieurs actions ont la même Q-value, on choisit aléatoirement
+            q_values = self.get_q_values(state, possible_actions)
+            return self.select_best_action(possible_actions, q_values)  # Si plusieurs actions ont la même Q-value, on choisit aléatoirement
 
-    # Extraire des caractéristiques simples à partir de l'état et de l'action
+    # Extraire les caractéristiques de la position obtenue après l'action (voir feature_extractor.py)
     def extract_features(self, state, action):
-            board = ChessBoard(state)
-            
-            # Récupérer les positions de toutes les pièces
-            piece_positions = board.get_piece_positions()
-
-            # Extraire quelques caractéristiques intéressantes, par exemple :
-            # - Position des rois
-            white_king_pos = piece_positions.get('K', [])[0]  # Première position du roi blanc
-            black_king_pos = piece_positions.get('k', [])[0]  # Première position du roi noir
-            
-            # - Nombre de pions sur le plateau
-            white_pawns = len(piece_positions.get('P', []))
-            black_pawns = len(piece_positions.get('p', []))
-            
-            # - Distance entre les rois
-            king_distance = abs(white_king_pos[0] - black_king_pos[0]) + abs(white_king_pos[1] - black_king_pos[1])
-
-            # Retourner les caractéristiques sous forme de liste
-            features = [
-                white_king_pos[0], white_king_pos[1],  # Position du roi blanc (x, y)
-                black_king_pos[0], black_king_pos[1],  # Position du roi noir (x, y)
-                white_pawns, black_pawns,  # Nombre de pions blancs et noirs
-                king_distance  # Distance entre les rois
-            ]
-            return features
+        return self.feature_extractor.extract(state, action)
 
     # Met à jour le modèle de Q-learning approximatif
     def update_q(self, state, action, reward, next_state, possible_actions):
-        best_next_action = max(possible_actions, key=lambda action: self.get_q_value(next_state, action))
-        future_q = reward + self.gamma * self.get_q_value(next_state, best_next_action)
+        # Les caractéristiques dépendant du coup, le maximum est pris sur les coups légaux de next_state
+        # (les coups de state n'y sont en général pas jouables) ; un état terminal vaut 0
+        next_actions = self.feature_extractor.legal_moves(next_state)
+        if self.replay is not None:
+            self.replay.add(self.extract_features(state, action), reward,
+                            self.feature_extractor.extract_batch(next_state, next_actions))
+            self.replay_update()
+            return
+
+        future_q = reward
+        if next_actions:
+            future_q += self.gamma * np.max(self.get_q_values(next_state, next_actions))
         
         # Calculer la différence entre la Q-value prédite et la nouvelle valeur cible
         features = self.extract_features(state, action)
+        if self.learner != "refit":
+            self.update_weights(features, future_q)
+            return
+
         self.X.append(features)
         self.y.append(future_q)
 
         # Recalibrer le modèle (en réajustant les poids à chaque fois)
         if len(self.X) > 0:
-            self.model.fit(self.X, self.y)  # Entraînement du modèle avec les données collectées
+            self.fit_model(self.X, self.y)  # Entraînement du modèle avec les données collectées
+
+    # Réajustement de la LinearRegression, chronométré si une instrumentation est attachée
+    def fit_model(self, X, y):
+        if self.instrumentation is None:
+            self.model.fit(X, y)
+            return
+        start = time.perf_counter()
+        self.model.fit(X, y)
+        self.instrumentation.add("train.refit", time.perf_counter() - start)
+
+    # Mise à jour sur la mémoire de rejeu, les cibles étant recalculées avec le modèle courant
+    def replay_update(self):
+        if self.learner == "refit":
+            indices, weights = np.arange(len(self.replay)), None
+        else:
+            indices, weights = self.replay.sample(self.batch_size)
+        predict = self.predict if self.is_fitted() else (lambda features: np.zeros(len(features)))
+        targets = self.replay.targets(indices, predict, self.gamma)
+        features = self.replay.features[indices]
+
+        if self.learner == "refit":
+            self.fit_model(features, targets)
+            return
+
+        x = np.hstack([features, np.ones((len(features), 1))])  # Ajout du biais
+        if self.weights is None:
+            self.weights = np.zeros(x.shape[1])
+        errors = targets - x @ self.weights
+        self.replay.update_priorities(indices, errors)
+        # Pas de semi-gradient normalisé moyen, pondéré par les poids d'importance
+        steps = (weights * errors / np.einsum("ij,ij->i", x, x))[:, None] * x
+        self.weights += self.alpha * np.mean(steps, axis=0)
+
+    # Mise à jour en ligne du vecteur de poids, en O(caractéristiques) pour "td"
+    def update_weights(self, features, target):
+        x = np.append(np.asarray(features, dtype=float), 1.0)  # Ajout du biais
+        if self.weights is None:
+            self.weights = np.zeros(len(x))
+            self.P = np.eye(len(x)) * 100.0
+
+        error = target - np.dot(self.weights, x)
+
+        if self.learner == "td":
+            # Semi-gradient TD normalisé : stable pour 0 < alpha < 2 quelle que soit l'échelle des caractéristiques
+            self.weights += self.alpha * error * x / np.dot(x, x)
+        else:
+            # Moindres carrés récursifs : équivalent à refit sans conserver l'historique
+            Px = self.P @ x
+            gain = Px / (1.0 + np.dot(x, Px))
+            self.weights += gain * error
+            self.P -= np.outer(gain, Px)
+
+    # Versions par lot pour VectorChessEnv (voir vector_env.py) : un seul appel au modèle par lot
+    def choose_actions(self, states, possible_actions_list):
+        explore = np.random.rand(len(states)) < self.epsilon
+        q_values = self.get_q_values_batch(
+            states, [[] if exploring else actions for exploring, actions in zip(explore, possible_actions_list)])
+        return [random.choice(actions) if exploring else self.select_best_action(actions, values)
+                for exploring, actions, values in zip(explore, possible_actions_list, q_values)]
+
+    def get_best_moves(self, states, possible_actions_list):
+        q_values = self.get_q_values_batch(states, possible_actions_list)
+        return [self.select_best_action(actions, values) for actions, values in zip(possible_actions_list, q_values)]
+
+    def update_q_batch(self, states, actions, rewards, next_states, possible_actions_list):
+        if not len(states):
+            return
+        next_actions = [self.feature_extractor.legal_moves(next_state) for next_state in next_states]
+        if self.replay is not None:
+            for state, action, reward, next_state, actions_next in zip(states, actions, rewards, next_states, next_actions):
+                self.replay.add(self.extract_features(state, action), reward,
+                                self.feature_extractor.extract_batch(next_state, actions_next))
+            self.replay_update()  # Une seule mise à jour pour tout le lot
+            return
+        next_q = self.get_q_values_batch(next_states, next_actions)
+        targets = np.array([reward + (self.gamma * np.max(values) if len(values) else 0)
+                            for reward, values in zip(rewards, next_q)])
+        features = np.array([self.extract_features(state, action) for state, action in zip(states, actions)])
+
+        if self.learner == "refit":
+            self.X.extend(features)
+            self.y.extend(targets)
+            self.fit_model(self.X, self.y)  # Un seul réajustement pour tout le lot
+        elif self.learner == "td" and self.weights is not None:
+            # Moyenne des pas de semi-gradient normalisés du lot, en une opération matricielle
+            x = np.hstack([features, np.ones((len(features), 1))])
+            errors = targets - x @ self.weights
+            self.weights += self.alpha * np.mean((errors / np.einsum("ij,ij->i", x, x))[:, None] * x, axis=0)
+        else:
+            for row, target in zip(features, targets):
+                self.update_weights(row, target)
 
     # Retourne le meilleur coup en utilisant l'approximation de la Q-table
     def get_best_move(self, state, possible_actions):
-        q_values = [self.get_q_value(state, action) for action in possible_actions]
-        max_q = max(q_values)
-        best_actions = [action for action, q in zip(possible_actions, q_values) if q == max_q]
-        return random.choice(best_actions)  # Si plusieurs actions ont la même Q-value, on choisit aléatoirement
+        q_values = self.get_q_values(state, possible_actions)
+        return self.select_best_action(possible_actions, q_values)  # Si plusieurs actions ont la même Q-value, on choisit aléatoirement
+
+    # Copie du modèle publiée par le processus d'apprentissage vers les acteurs (voir async_training.py) :
+    # fit et les mises à jour en ligne modifient le modèle et les poids sur place
+    def snapshot(self):
+        return copy.deepcopy(self.model), None if self.weights is None else self.weights.copy()
+
+    def load_snapshot(self, snapshot):
+        self.model, self.weights = snapshot
+
+    # Historique, modèle, poids et mémoire de rejeu en tableaux NumPy pour une sauvegarde sur disque
+    # (voir checkpoint.py) ; la LinearRegression est gardée par ses attributs ajustés
+    def checkpoint_state(self):
+        arrays = {"X": np.array(self.X, dtype=np.float64).reshape(len(self.X), len(FEATURE_NAMES)),
+                  "y": np.array(self.y, dtype=np.float64)}
+        meta = {}
+        if hasattr(self.model, "coef_"):
+            arrays.update({"model.coef": self.model.coef_, "model.intercept": np.asarray(self.model.intercept_),
+                           "model.singular": self.model.singular_})
+            meta["model"] = {"rank": int(self.model.rank_), "n_features_in": int(self.model.n_features_in_)}
+        if self.weights is not None:
+            arrays["weights"] = self.weights
+        if self.P is not None:
+            arrays["P"] = self.P
+        if self.replay is not None:
+            replay_arrays, meta["replay"] = self.replay.checkpoint_state()
+            arrays.update(prefixed(replay_arrays, "replay"))
+        return arrays, meta
+
+    def load_checkpoint_state(self, arrays, meta):
+        self.X = list(arrays["X"])
+        self.y = arrays["y"].tolist()
+        if "model" in meta:
+            self.model = LinearRegression()
+            self.model.coef_ = arrays["model.coef"]
+            self.model.intercept_ = float(arrays["model.intercept"])
+            self.model.singular_ = arrays["model.singular"]
+            self.model.rank_ = meta["model"]["rank"]
+            self.model.n_features_in_ = meta["model"]["n_features_in"]
+        self.weights = arrays.get("weights")
+        self.P = arrays.get("P")
+        if "replay" in meta:
+            self.replay.load_checkpoint_state(unprefixed(arrays, "replay"), meta["replay"])
+
+    # État courant du plateau pour le moteur d'épisodes : une copie sans historique, car les
+    # caractéristiques de (state, action) sont calculées après que le plateau vivant a avancé
+    def state_key(self, board):
+        return board.copy(stack=False)
 
     # Entraînement de l'agent avec un certain nombre d'épisodes sur un plateau fen
     def train(self, episodes, fen_string):
-
-        # Si la table Q possède déjà des valeurs pour cet état, jouer le meilleur coup
-        test_still_mat_in_Q = ChessBoard(fen_string)
-        action = self.get_best_move(fen_string, test_still_mat_in_Q.get_possible_moves())
-        test_still_mat_in_Q.apply_move(action)
-
-        if not test_still_mat_in_Q.is_game_over():
-            for episode in range(episodes):
-                state = fen_string
-                board = ChessBoard(fen_string)
-                done = False
-                position_history = set()
-
-                while not done:
-                    possible_actions = [move for move in board.get_possible_moves()]
-                    best_move = self.choose_action(state, possible_actions)
-                    board.apply_move(best_move)
-
-                    # Vérifier la répétition de positions
-                    position_hash = hash(board.get_fen())
-                    if position_hash in position_history:
-                        reward = -10  # Pénalité pour répétition
-                        break  # Sortir de la boucle
-                    position_history.add(position_hash)
-
-                    next_state = board.get_fen()
-                    reward = -1
-
-                    # Vérifier si la partie est terminée
-                    if board.get_is_fifty_moves():
-                        reward = -50  # Pénalité pour la règle des 50 coups
-                        done = True
-                    elif board.is_game_over():
-                        reward = 100  # Récompense positive pour la victoire
-                        done = True
-
-                    self.update_q(state, best_move, reward, next_state, possible_actions)
-                    state = next_state
-
-                # Décrémenter epsilon pour favoriser l'exploitation au fil des épisodes
-                self.epsilon = max(0.01, self.epsilon * 0.995)
+        return default_engine.train(self, episodes, fen_string)
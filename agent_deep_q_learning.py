@@ -0,0 +1,221 @@
+import chess
+import numpy as np
+import random
+from checkpoint import prefixed, unprefixed
+from episode_engine import default_engine
+from feature_extractor import FeatureExtractor
+from replay_buffer import BoardReplayBuffer
+
+# Encodage d'un plateau : 12 plans de 64 cases (couleur x type de pièce) suivis du trait
+NB_INPUTS = 12 * 64 + 1
+
+
+# Plans binaires d'un plateau, lus directement dans les bitboards (bit i d'un plan = case i)
+def board_planes(board):
+    masks = np.array([board.pieces_mask(piece_type, color) for color in chess.COLORS for piece_type in chess.PIECE_TYPES],
+                     dtype="<u8")
+    return np.append(np.unpackbits(masks.view(np.uint8), bitorder="little"), np.uint8(board.turn))
+
+
+# Cases de départ et d'arrivée des coups, une ligne par coup (les promotions ne sont pas distinguées)
+def move_squares(moves):
+    return np.array([(move.from_square, move.to_square) for move in moves], dtype=np.int64).reshape(-1, 2)
+
+
+class DeepQLearningAgent:
+    # Réseau de neurones multicouche en NumPy : Q(s, a) = MLP(plans de s, départ de a, arrivée de a).
+    # La première couche est séparée en une partie plateau, calculée une seule fois par état, et deux
+    # tables indexées par les cases du coup : toutes les actions d'un état passent en un seul lot.
+    # Apprentissage par minibatchs tirés d'une mémoire de rejeu, optimiseur Adam et réseau cible
+    # recopié toutes les target_update mises à jour. Le réseau prédit Q / value_scale.
+    # alpha est gardé pour les configurations communes aux agents ; le réseau apprend avec learning_rate.
+    def __init__(self, alpha=0.1, gamma=0.9, epsilon=0.1, hidden_sizes=(128, 64), learning_rate=1e-3, batch_size=32,
+                 replay_capacity=10000, target_update=250, value_scale=100.0):
+        """Initialisation des paramètres du Deep Q-learning."""
+        self.alpha = alpha  # Taux d'apprentissage des autres agents (non utilisé par le réseau)
+        self.gamma = gamma  # Facteur de discount
+        self.epsilon = epsilon  # Taux d'exploration
+        self.learning_rate = learning_rate  # Pas d'Adam
+        self.batch_size = batch_size  # Taille des minibatchs
+        self.target_update = target_update  # Nombre de mises à jour entre deux copies du réseau cible
+        self.value_scale = value_scale  # Échelle des valeurs Q (récompenses jusqu'à 100)
+        self.params = self.init_params(hidden_sizes)  # [plateau, départ, arrivée, biais, (poids, biais)...]
+        self.target_params = [param.copy() for param in self.params]  # Réseau cible
+        self.adam_m = [np.zeros_like(param) for param in self.params]  # Moments d'Adam
+        self.adam_v = [np.zeros_like(param) for param in self.params]
+        self.nb_updates = 0
+        self.replay = BoardReplayBuffer(replay_capacity, NB_INPUTS)  # Mémoire de rejeu bornée
+        self.feature_extractor = FeatureExtractor()  # Plateaux et coups légaux des états, avec cache
+
+    # Initialisation de He ; l'encodage étant creux, la première couche ne voit qu'une trentaine
+    # d'entrées actives (au plus 32 pièces, le trait, le départ et l'arrivée)
+    def init_params(self, hidden_sizes):
+        first = hidden_sizes[0]
+        scale = np.sqrt(2.0 / 35)
+        params = [np.random.randn(NB_INPUTS, first) * scale, np.random.randn(64, first) * scale,
+                  np.random.randn(64, first) * scale, np.zeros(first)]
+        for fan_in, fan_out in zip(hidden_sizes, list(hidden_sizes[1:]) + [1]):
+            params += [np.random.randn(fan_in, fan_out) * np.sqrt(2.0 / fan_in), np.zeros(fan_out)]
+        return params
+
+    # Propagation avant ; board_part contient la partie plateau de la première couche pour chaque ligne
+    # Retourne les sorties (une par ligne) et les activations des couches cachées
+    def forward(self, params, board_part, moves):
+        z = board_part + params[1][moves[:, 0]] + params[2][moves[:, 1]] + params[3]
+        hidden = [np.maximum(z, 0)]
+        layers = list(zip(params[4::2], params[5::2]))
+        for weights, bias in layers[:-1]:
+            hidden.append(np.maximum(hidden[-1] @ weights + bias, 0))
+        weights, bias = layers[-1]
+        return (hidden[-1] @ weights + bias)[:, 0], hidden
+
+    # Rétropropagation de la dérivée de la perte par rapport aux sorties
+    def backward(self, planes, moves, hidden, output_grad):
+        grads = [None] * len(self.params)
+        delta = output_grad[:, None]
+        for layer in range((len(self.params) - 4) // 2 - 1, -1, -1):
+            weights = self.params[4 + 2 * layer]
+            grads[4 + 2 * layer] = hidden[layer].T @ delta
+            grads[5 + 2 * layer] = delta.sum(axis=0)
+            delta = (delta @ weights.T) * (hidden[layer] > 0)
+
+        grads[0] = planes.T @ delta
+        grads[1] = np.zeros_like(self.params[1])
+        grads[2] = np.zeros_like(self.params[2])
+        np.add.at(grads[1], moves[:, 0], delta)
+        np.add.at(grads[2], moves[:, 1], delta)
+        grads[3] = delta.sum(axis=0)
+        return grads
+
+    # Pas d'Adam sur tous les paramètres
+    def adam(self, grads, beta1=0.9, beta2=0.999):
+        self.nb_updates += 1
+        for param, grad, m, v in zip(self.params, grads, self.adam_m, self.adam_v):
+            m *= beta1
+            m += (1 - beta1) * grad
+            v *= beta2
+            v += (1 - beta2) * grad * grad
+            m_hat = m / (1 - beta1 ** self.nb_updates)
+            v_hat = v / (1 - beta2 ** self.nb_updates)
+            param -= self.learning_rate * m_hat / (np.sqrt(v_hat) + 1e-8)
+
+    # Retourne les valeurs Q de toutes les actions d'un état en une seule passe du réseau
+    def get_q_values(self, state, possible_actions):
+        return self.get_q_values_batch([state], [possible_actions])[0]
+
+    def get_q_value(self, state, action):
+        return self.get_q_values(state, [action])[0]
+
+    # Valeurs Q des actions de plusieurs états, en une seule passe pour tout le lot
+    def get_q_values_batch(self, states, possible_actions_list):
+        sizes = [len(actions) for actions in possible_actions_list]
+        if not sum(sizes):
+            return [np.zeros(size) for size in sizes]
+        planes = np.array([board_planes(self.feature_extractor.get_board(state))
+                           for state, actions in zip(states, possible_actions_list) if actions])
+        board_part = np.repeat(planes @ self.params[0], [size for size in sizes if size], axis=0)
+        moves = np.vstack([move_squares(actions) for actions in possible_actions_list if actions])
+        q_values, _ = self.forward(self.params, board_part, moves)
+        return np.split(q_values * self.value_scale, np.cumsum(sizes)[:-1])
+
+    # Choisit aléatoirement parmi les actions ayant la Q-value maximale
+    def select_best_action(self, possible_actions, q_values):
+        best_indices = np.flatnonzero(q_values == np.max(q_values))
+        return possible_actions[random.choice(best_indices)]
+
+    # Choisir une action selon une politique d'exploration/exploitation
+    def choose_action(self, state, possible_actions):
+        if np.random.rand() < self.epsilon:
+            return random.choice(possible_actions)  # Exploration
+        return self.get_best_move(state, possible_actions)
+
+    # Retourne le meilleur coup selon le réseau
+    def get_best_move(self, state, possible_actions):
+        return self.select_best_action(possible_actions, self.get_q_values(state, possible_actions))
+
+    # Ajoute la transition à la mémoire de rejeu puis fait un pas d'apprentissage sur un minibatch ;
+    # comme pour l'agent approximatif, le maximum est pris sur les coups légaux de next_state
+    def update_q(self, state, action, reward, next_state, possible_actions):
+        self.remember(state, action, reward, next_state)
+        self.train_step()
+
+    def remember(self, state, action, reward, next_state):
+        next_board = self.feature_extractor.get_board(next_state)
+        self.replay.add(board_planes(self.feature_extractor.get_board(state)), (action.from_square, action.to_square),
+                        reward, board_planes(next_board), move_squares(self.feature_extractor.legal_moves(next_board)))
+
+    # Cibles r + gamma * max Q_cible(s', a') d'un minibatch, à l'échelle du réseau ; un état terminal vaut 0
+    def targets(self, indices):
+        mask = self.replay.next_mask[indices]
+        width = max(1, int(mask.sum(axis=1).max()))  # Les coups sont rangés en tête de ligne
+        mask = mask[:, :width]
+        board_part = np.repeat(self.replay.next_planes[indices] @ self.target_params[0], width, axis=0)
+        moves = self.replay.next_moves[indices, :width].reshape(-1, 2)
+        next_q, _ = self.forward(self.target_params, board_part, moves)
+        next_q = np.where(mask, next_q.reshape(mask.shape), -np.inf).max(axis=1)
+        next_q = np.where(mask.any(axis=1), next_q, 0.0)
+        return self.replay.rewards[indices] / self.value_scale + self.gamma * next_q
+
+    # Un pas de descente sur l'erreur quadratique moyenne d'un minibatch
+    def train_step(self):
+        if len(self.replay) < self.batch_size:
+            return
+        indices = self.replay.sample(self.batch_size)
+        targets = self.targets(indices)
+        planes = self.replay.planes[indices].astype(float)
+        moves = self.replay.moves[indices]
+        q_values, hidden = self.forward(self.params, planes @ self.params[0], moves)
+        self.adam(self.backward(planes, moves, hidden, (q_values - targets) / len(indices)))
+
+        if self.nb_updates % self.target_update == 0:
+            self.target_params = [param.copy() for param in self.params]
+
+    # Versions par lot pour VectorChessEnv (voir vector_env.py)
+    def choose_actions(self, states, possible_actions_list):
+        explore = np.random.rand(len(states)) < self.epsilon
+        q_values = self.get_q_values_batch(
+            states, [[] if exploring else actions for exploring, actions in zip(explore, possible_actions_list)])
+        return [random.choice(actions) if exploring else self.select_best_action(actions, values)
+                for exploring, actions, values in zip(explore, possible_actions_list, q_values)]
+
+    def get_best_moves(self, states, possible_actions_list):
+        q_values = self.get_q_values_batch(states, possible_actions_list)
+        return [self.select_best_action(actions, values) for actions, values in zip(possible_actions_list, q_values)]
+
+    def update_q_batch(self, states, actions, rewards, next_states, possible_actions_list):
+        for state, action, reward, next_state in zip(states, actions, rewards, next_states):
+            self.remember(state, action, reward, next_state)
+        if len(states):
+            self.train_step()  # Un seul pas d'apprentissage pour tout le lot
+
+    # Copie des poids du réseau publiée par le processus d'apprentissage vers les acteurs (voir
+    # async_training.py) : Adam les modifie sur place
+    def snapshot(self):
+        return [param.copy() for param in self.params]
+
+    def load_snapshot(self, snapshot):
+        self.params = snapshot
+
+    # Réseau, réseau cible, moments d'Adam et mémoire de rejeu pour une sauvegarde sur disque
+    # (voir checkpoint.py)
+    def checkpoint_state(self):
+        arrays = {}
+        for name in ("params", "target_params", "adam_m", "adam_v"):
+            arrays.update({f"{name}.{index}": param for index, param in enumerate(getattr(self, name))})
+        replay_arrays, replay_meta = self.replay.checkpoint_state()
+        arrays.update(prefixed(replay_arrays, "replay"))
+        return arrays, {"nb_params": len(self.params), "nb_updates": self.nb_updates, "replay": replay_meta}
+
+    def load_checkpoint_state(self, arrays, meta):
+        for name in ("params", "target_params", "adam_m", "adam_v"):
+            setattr(self, name, [arrays[f"{name}.{index}"] for index in range(meta["nb_params"])])
+        self.nb_updates = meta["nb_updates"]
+        self.replay.load_checkpoint_state(unprefixed(arrays, "replay"), meta["replay"])
+
+    # État courant du plateau pour le moteur d'épisodes : une copie sans historique
+    def state_key(self, board):
+        return board.copy(stack=False)
+
+    # Entraînement de l'agent avec un certain nombre d'épisodes sur un plateau fen
+    def train(self, episodes, fen_string):
+        return default_engine.train(self, episodes, fen_string)
@@ -1,80 +1,102 @@
 import numpy as np
 import random
-from chess_board import ChessBoard
+from checkpoint import prefixed, unprefixed
+from episode_engine import default_engine
+from planning import PlanningModel
+from q_table import BoundedQTable, DenseQTable, DictQTable
+from state_encoding import StateEncoder
+
+# Stockages de la table Q disponibles :
+# - "dict" : dictionnaire de dictionnaires indexé par StateEncoder (comportement d'origine)
+# - "dense" : tableau NumPy préalloué pour un matériel fixé (voir q_table.py)
+# - "bounded" : dictionnaire limité à max_entries états et/ou max_bytes octets estimés, éviction "lru" ou "lfu"
+Q_TABLES = ("dict", "dense", "bounded")
+# Planification optionnelle (voir planning.py) : planning="dyna" ou "sweeping" ajoute planning_steps
+# mises à jour simulées après chaque transition réelle
+
 
 class QLearningAgent:
-    def __init__(self, alpha=0.1, gamma=0.9, epsilon=0.1):
+    def __init__(self, alpha=0.1, gamma=0.9, epsilon=0.1, state_encoding="fen", symmetry=False, q_table="dict",
+                 planning=None, planning_steps=10, max_entries=100000, max_bytes=None, eviction="lru"):
+        if q_table not in Q_TABLES:
+            raise ValueError("Table Q invalide. Utilisez 'dict', 'dense' ou 'bounded'.")
         self.alpha = alpha  # Taux d'apprentissage
         self.gamma = gamma  # Facteur de discount
         self.epsilon = epsilon  # Taux d'exploration
-        self.Q = {}  # Table Q
+        self.encoder = StateEncoder(state_encoding, symmetry)  # Encodage des états et des coups (voir state_encoding.py)
+        # Table Q
+        if q_table == "dict":
+            self.Q = DictQTable(self.encoder)
+        elif q_table == "dense":
+            self.Q = DenseQTable()
+        else:
+            self.Q = BoundedQTable(self.encoder, max_entries, max_bytes, eviction)
+        self.planning_steps = planning_steps  # Mises à jour simulées par transition réelle
+        self.planner = PlanningModel(self.Q, alpha, gamma, planning) if planning else None  # Modèle des transitions
 
     # Retourne la valeur Q d'un état et d'une action donnés
     def get_q_value(self, state, action):
-        return self.Q.get(state, {}).get(action, 0)
+        return self.Q.get(state, action)
 
     # Choisir une action selon une politique d'exploration/exploitation
     def choose_action(self, state, possible_actions):
         if np.random.rand() < self.epsilon:
             return random.choice(possible_actions)  # Exploration
         else:
-            if state not in self.Q:
-                self.Q[state] = {action: 0 for action in possible_actions}
-            return max(possible_actions, key=lambda action: self.Q[state].get(action, 0))
+            return self.get_best_move(state, possible_actions)
 
     # Met à jour la table Q en utilisant la formule de Q-learning
     def update_q(self, state, action, reward, next_state, possible_actions):
-        best_next_action = max(possible_actions, key=lambda action: self.Q.get(next_state, {}).get(action, 0))
-        current_q = self.Q.get(state, {}).get(action, 0)
-        future_q = reward + self.gamma * self.Q.get(next_state, {}).get(best_next_action, 0)
-        self.Q.setdefault(state, {})[action] = current_q + self.alpha * (future_q - current_q)
+        future_q = reward + self.gamma * max(self.Q.q_values(next_state, possible_actions))
+        self.Q.update(state, action, future_q, self.alpha)
+        if self.planner is not None:
+            self.planner.observe(state, action, reward, next_state, possible_actions, self.planning_steps)
 
     # Retourne le meilleur coup à partir de la Q-table pour un état donné
     def get_best_move(self, state, possible_actions):
-        if state not in self.Q:  # Si l'état n'a pas encore d'entrée dans la Q-table
-            self.Q[state] = {action: 0 for action in possible_actions}  # Initialiser la Q-table pour cet état avec des Q-values à 0
-        return max(possible_actions, key=lambda action: self.Q[state].get(action, 0))
+        # Une entrée est créée avec des Q-values à 0 si l'état n'est pas encore dans la Q-table
+        q_values = self.Q.q_values(state, possible_actions, init=True)
+        return possible_actions[int(np.argmax(q_values))]
     
-    # Entraînement de l'agent sur un certain nombre d'épisodes sur un plateau fen
-    def train(self, episodes, fen_string):
+    # Versions par lot pour VectorChessEnv (voir vector_env.py)
+    def choose_actions(self, states, possible_actions_list):
+        return [self.choose_action(state, actions) for state, actions in zip(states, possible_actions_list)]
 
-        # Si la table Q possède déjà des valeurs pour cet état, jouer le meilleur coup
-        test_still_mat_in_Q = ChessBoard(fen_string)
-        action = self.get_best_move(fen_string, test_still_mat_in_Q.get_possible_moves())
-        test_still_mat_in_Q.apply_move(action)
+    def get_best_moves(self, states, possible_actions_list):
+        return [self.get_best_move(state, actions) for state, actions in zip(states, possible_actions_list)]
 
-        if not test_still_mat_in_Q.is_game_over():
-            for episode in range(episodes):
-                state = fen_string
-                board = ChessBoard(fen_string)
-                done = False
-                position_history = set()
+    # Toutes les cibles sont calculées avec la table telle qu'avant le lot, puis appliquées ensemble
+    def update_q_batch(self, states, actions, rewards, next_states, possible_actions_list):
+        targets = [reward + self.gamma * max(self.Q.q_values(next_state, possible_actions))
+                   for reward, next_state, possible_actions in zip(rewards, next_states, possible_actions_list)]
+        for state, action, target in zip(states, actions, targets):
+            self.Q.update(state, action, target, self.alpha)
+        if self.planner is not None:
+            for state, action, reward, next_state, possible_actions in zip(
+                    states, actions, rewards, next_states, possible_actions_list):
+                self.planner.observe(state, action, reward, next_state, possible_actions, self.planning_steps)
 
-                while not done:
-                    possible_actions = [move for move in board.get_possible_moves()]
-                    best_move = self.choose_action(state, possible_actions)
-                    board.apply_move(best_move)
+    # Table Q publiée par le processus d'apprentissage vers les acteurs (voir async_training.py)
+    def snapshot(self):
+        return self.Q.snapshot()
 
-                    # Vérifier la répétition de positions
-                    position_hash = hash(board.get_fen())
-                    if position_hash in position_history:
-                        reward = -10  # Pénalité pour répétition
-                        break  # Sortir de la boucle
-                    position_history.add(position_hash)
+    def load_snapshot(self, snapshot):
+        self.Q.load_snapshot(snapshot)
 
-                    next_state = board.get_fen()
-                    reward = -1
+    # Table Q en tableaux NumPy pour une sauvegarde sur disque (voir checkpoint.py)
+    def checkpoint_state(self):
+        if self.planner is not None:
+            raise ValueError("Sauvegarde invalide avec planification. Utilisez planning=None.")
+        arrays, meta = self.Q.checkpoint_state()
+        return prefixed(arrays, "Q"), {"Q": meta}
 
-                    # Vérifier si la partie est terminée
-                    if board.get_is_fifty_moves():
-                        reward = -50  # Pénalité pour la règle des 50 coups
-                        done = True
-                    elif board.is_game_over():
-                        reward = 100  # Récompense positive pour la victoire
-                        done = True
+    def load_checkpoint_state(self, arrays, meta):
+        self.Q.load_checkpoint_state(unprefixed(arrays, "Q"), meta["Q"])
 
-                    self.update_q(state, best_move, reward, next_state, possible_actions)
-                    state = next_state
+    # Clé de l'état courant du plateau, calculée une fois par demi-coup par le moteur d'épisodes
+    def state_key(self, board):
+        return self.Q.key(board)
 
-                # Décrémenter epsilon pour favoriser l'exploitation au fil des épisodes
-                self.epsilon = max(0.01, self.epsilon * 0.995)
\ No newline at end of file
+    # Entraînement de l'agent sur un certain nombre d'épisodes sur un plateau fen
+    def train(self, episodes, fen_string):
+        return default_engine.train(self, episodes, fen_string)
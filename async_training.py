@@ -0,0 +1,168 @@
+import multiprocessing
+import queue
+import time
+import chess
+from episode_engine import EPSILON_DECAY, default_engine
+from experiment_runner import AGENT_CONFIGURATIONS, job_seed, play_evaluation_game, seed_everything
+
+ACTOR_POLL_INTERVAL = 1.0  # Attente maximale (secondes) d'une transition avant de vérifier les acteurs
+
+
+# Agent vu par le moteur d'épisodes dans un processus acteur : il joue avec la dernière version
+# publiée de l'agent, mais envoie ses transitions au processus d'apprentissage au lieu d'apprendre
+class TransitionRecorder:
+    def __init__(self, agent, transitions, chunk_size):
+        self.agent = agent
+        self.transitions = transitions  # File des transitions vers l'apprentissage
+        self.chunk_size = chunk_size  # Nombre de transitions envoyées ensemble
+        self.chunk = []
+
+    def __getattr__(self, name):
+        return getattr(self.agent, name)
+
+    # epsilon est décrémenté par le moteur d'épisodes : il doit l'être sur l'agent lui-même
+    @property
+    def epsilon(self):
+        return self.agent.epsilon
+
+    @epsilon.setter
+    def epsilon(self, value):
+        self.agent.epsilon = value
+
+    def update_q(self, state, action, reward, next_state, possible_actions):
+        self.chunk.append((state, action, reward, next_state, possible_actions))
+        if len(self.chunk) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.chunk:
+            self.transitions.put(self.chunk)
+            self.chunk = []
+
+
+# Processus acteur : joue ses épisodes avec son propre epsilon et recharge la dernière version
+# publiée de l'agent avant chaque épisode ; envoie son numéro quand il a terminé
+def run_actor(actor_idx, agent, fens, epsilon, seed, transitions, snapshots, chunk_size):
+    if seed is not None:
+        seed_everything(seed)
+    agent.epsilon = epsilon
+    recorder = TransitionRecorder(agent, transitions, chunk_size)
+    for fen_string in fens:
+        snapshot = None
+        try:
+            while True:
+                snapshot = snapshots.get_nowait()  # Seule la plus récente compte
+        except queue.Empty:
+            pass
+        if snapshot is not None:
+            agent.load_snapshot(snapshot)
+        default_engine.train(recorder, 1, fen_string)
+    recorder.flush()
+    transitions.put(actor_idx)
+
+
+# Epsilon de chaque acteur : de epsilon à epsilon ** 8, pour que certains acteurs explorent
+# beaucoup et d'autres jouent presque la politique apprise
+def actor_epsilons(epsilon, nb_actors):
+    if nb_actors == 1:
+        return [epsilon]
+    return [epsilon ** (1 + 7 * i / (nb_actors - 1)) for i in range(nb_actors)]
+
+
+# Entraîne un seul agent sur toutes les positions avec nb_actors processus acteurs : chaque acteur
+# joue sa part des len(fens) * episodes épisodes et envoie ses transitions par une file ; ce
+# processus, seul propriétaire de la table Q ou du modèle, les apprend et publie une copie de
+# l'agent vers les acteurs toutes les publish_every transitions.
+# L'ordre d'arrivée des transitions dépend de l'ordonnancement des processus : avec une graine,
+# chaque acteur est reproductible mais l'apprentissage ne l'est pas exactement.
+# Retourne le nombre de transitions apprises.
+def train_async(agent, fens, episodes, nb_actors=2, publish_every=1000, chunk_size=64, seed=None):
+    episode_fens = [fen_string for _ in range(episodes) for fen_string in fens]
+    # Les clés d'état calculées par les acteurs doivent avoir le même sens ici : une table dense est
+    # dimensionnée avant le lancement des acteurs plutôt que dans chacun d'eux
+    agent.state_key(chess.Board(fens[0]))
+    context = multiprocessing.get_context()
+    transitions = context.Queue(maxsize=4 * nb_actors)  # Bornée : les acteurs attendent un apprentissage lent
+    snapshots = [context.Queue(maxsize=1) for _ in range(nb_actors)]
+    actors = [
+        context.Process(target=run_actor, daemon=True, args=(
+            i, agent, episode_fens[i::nb_actors], epsilon,
+            None if seed is None else job_seed(seed, 0, 0, i + 1), transitions, snapshots[i], chunk_size))
+        for i, epsilon in enumerate(actor_epsilons(agent.epsilon, nb_actors))
+    ]
+    for actor in actors:
+        actor.start()
+
+    steps = 0
+    finished = set()  # Acteurs dont le signal de fin a été reçu
+    while len(finished) < nb_actors:
+        try:
+            chunk = transitions.get(timeout=ACTOR_POLL_INTERVAL)
+        except queue.Empty:
+            check_actors(actors, finished)
+            continue
+        if isinstance(chunk, int):
+            finished.add(chunk)
+            continue
+        for transition in chunk:
+            agent.update_q(*transition)
+            steps += 1
+            if steps % publish_every == 0:
+                publish(agent, snapshots)
+
+    for actor in actors:
+        actor.join()
+    # Une copie non lue par un acteur terminé ne doit pas bloquer la fin de ce processus
+    for snapshot_queue in snapshots:
+        snapshot_queue.cancel_join_thread()
+    # Comme pour le moteur d'épisodes, epsilon décroît une fois par épisode joué depuis chaque position
+    agent.epsilon = max(0.01, agent.epsilon * getattr(agent, "epsilon_decay", EPSILON_DECAY) ** episodes)
+    return steps
+
+
+# Sans transition pendant ACTOR_POLL_INTERVAL secondes, vérifie que les acteurs sont encore en vie :
+# un acteur arrêté en erreur (exception, processus tué) n'enverra jamais son signal de fin, les
+# autres acteurs sont alors arrêtés et l'erreur est remontée. Un acteur terminé normalement a écrit
+# ses dernières transitions et son signal dans la file avant de s'arrêter : ils restent à lire.
+def check_actors(actors, finished):
+    for actor_idx, actor in enumerate(actors):
+        if actor_idx in finished or actor.is_alive() or actor.exitcode == 0:
+            continue
+        for other in actors:
+            other.terminate()
+        raise RuntimeError(f"Acteur {actor_idx} arrêté avec le code {actor.exitcode}.")
+
+
+# Publie l'agent vers les acteurs ; un acteur qui n'a pas encore lu la copie précédente la garde
+def publish(agent, snapshots):
+    snapshot = agent.snapshot()
+    for snapshot_queue in snapshots:
+        try:
+            snapshot_queue.put_nowait(snapshot)
+        except queue.Full:
+            pass
+
+
+# Variante partagée de experiment_runner.make_test : un seul agent par configuration apprend sur
+# toutes les positions, puis joue une partie d'évaluation depuis chacune à la fin de chaque tour.
+# Retourne le nombre de mats trouvés par configuration et par tour.
+def make_shared_test(agent_class, all_fen, episodes, nb_episodes, nb_actors=2, seed=None,
+                     agent_configurations=AGENT_CONFIGURATIONS):
+    all_fen = list(dict.fromkeys(all_fen))
+    mates_found_per_agent = [[0] * nb_episodes for _ in agent_configurations]
+    for agent_idx, config in enumerate(agent_configurations):
+        if seed is not None:
+            seed_everything(job_seed(seed, 0, 0, agent_idx))
+        agent = agent_class(**config)
+        for round_idx in range(nb_episodes):
+            start = time.perf_counter()
+            round_seed = None if seed is None else job_seed(seed, round_idx + 1, 0, agent_idx)
+            steps = train_async(agent, all_fen, episodes, nb_actors, seed=round_seed)
+            if round_seed is not None:
+                seed_everything(round_seed)  # Parties d'évaluation reproductibles
+            outcomes = [play_evaluation_game(agent, fen_string)[0] for fen_string in all_fen]
+            mates_found_per_agent[agent_idx][round_idx] = outcomes.count("mate")
+            print(f"Agent {agent_idx + 1} - tour {round_idx + 1} : {steps} transitions, "
+                  f"{outcomes.count('mate')}/{len(all_fen)} mats ({time.perf_counter() - start:.1f} s)")
+    print(mates_found_per_agent)
+    return mates_found_per_agent
@@ -0,0 +1,238 @@
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import chess
+import numpy as np
+from agent_approximate_q_learning import ApproximateQLearningAgent
+from agent_q_learning import QLearningAgent
+from chess_board import ChessBoard
+from chess_board_generator import ChessBoardGenerator
+from chess_board_loader import load_positions_from_file
+from experiment_runner import seed_everything
+from feature_extractor import FeatureExtractor
+
+# Fichiers de positions fournis avec le projet
+POSITION_FILES = ['mate_in_one_positions_3_pieces.txt', 'random_positions_3_pieces.txt', 'random_positions_6_pieces.txt']
+SIX_PIECES = [
+    (chess.KING, chess.WHITE), (chess.KING, chess.BLACK),
+    (chess.QUEEN, chess.WHITE), (chess.PAWN, chess.BLACK), (chess.PAWN, chess.BLACK), (chess.PAWN, chess.BLACK)
+]
+
+
+# Résumé d'une série de mesures : débit (opérations par seconde) et latences p50/p99 d'un appel
+def summarize(latencies, nb_ops=None):
+    latencies = np.asarray(latencies)
+    total = latencies.sum()
+    nb_ops = len(latencies) if nb_ops is None else nb_ops
+    return {
+        "calls": len(latencies),
+        "ops": int(nb_ops),
+        "ops_per_sec": nb_ops / total if total else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1e3,
+        "p99_ms": float(np.percentile(latencies, 99)) * 1e3,
+    }
+
+
+# Mesure la durée de chaque appel de function(*args) pour chaque jeu d'arguments
+def time_calls(function, arguments):
+    latencies, results = [], []
+    for args in arguments:
+        start = time.perf_counter()
+        results.append(function(*args))
+        latencies.append(time.perf_counter() - start)
+    return latencies, results
+
+
+# Transitions (plateau, coup, plateau suivant) tirées de parties aléatoires depuis les fichiers fournis
+def random_transitions(nb_transitions):
+    fens = [fen for file_name in POSITION_FILES for fen in load_positions_from_file(file_name)]
+    transitions = []
+    while len(transitions) < nb_transitions:
+        board = chess.Board(fens[len(transitions) % len(fens)])
+        for _ in range(20):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            move = moves[np.random.randint(len(moves))]
+            state = board.copy(stack=False)
+            board.push(move)
+            transitions.append((state, move, board.copy(stack=False)))
+    return transitions[:nb_transitions]
+
+
+# Générateur de positions : index des placements, tirage dans l'index et génération une à une
+def bench_generator(quick):
+    results = {}
+    generator = ChessBoardGenerator()
+    latencies, _ = time_calls(generator.build_index, [()])
+    results["generator.build_index[KQk]"] = summarize(latencies)
+    for size in (1000, 10000) if quick else (1000, 10000, 100000):
+        latencies, _ = time_calls(generator.index.sample, [(size, "random", seed, False) for seed in range(5)])
+        results[f"generator.index_sample[n={size}]"] = summarize(latencies, 5 * size)
+    generator = ChessBoardGenerator(SIX_PIECES)
+    for size in (10, 100) if quick else (10, 100, 1000):
+        latencies, _ = time_calls(generator.generate_fen_strings, [(size, "random", seed) for seed in range(3)])
+        results[f"generator.fen_strings[6 pieces, n={size}]"] = summarize(latencies, 3 * size)
+    return results
+
+
+# Plateau : coups légaux et coup aléatoire par demi-coup, en parties aléatoires
+def bench_board(quick):
+    results = {}
+    for file_name in POSITION_FILES:
+        latencies = []
+        for fen in load_positions_from_file(file_name) * (1 if quick else 5):
+            chess_board = ChessBoard(fen)
+            for _ in range(50):
+                start = time.perf_counter()
+                if not chess_board.get_possible_moves():
+                    break
+                chess_board.play_random_move()
+                latencies.append(time.perf_counter() - start)
+                if chess_board.is_game_over():
+                    break
+        results[f"board.random_ply[{file_name}]"] = summarize(latencies)
+    return results
+
+
+# Entraînement : demi-coups par seconde de train() pour chaque type d'agent
+def bench_train(quick):
+    results = {}
+    agents = {
+        "q_learning": lambda: QLearningAgent(0.5, 0.8, 0.1),
+        "q_learning_packed": lambda: QLearningAgent(0.5, 0.8, 0.1, state_encoding="packed", symmetry=True),
+        "approx_td": lambda: ApproximateQLearningAgent(0.5, 0.8, 0.1, learner="td"),
+    }
+    for file_name in POSITION_FILES[:2]:
+        fens = load_positions_from_file(file_name)[:5 if quick else 20]
+        for name, make_agent in agents.items():
+            latencies, steps = time_calls(lambda fen: make_agent().train(10, fen), [(fen,) for fen in fens])
+            results[f"train.{name}[{file_name}]"] = summarize(latencies, sum(steps))
+    return results
+
+
+# Caractéristiques : appels à extract sans cache (calcul) et avec cache (relecture)
+def bench_features(quick):
+    transitions = random_transitions(2000 if quick else 20000)
+    extractor = FeatureExtractor()
+    arguments = [(state, move) for state, move, _ in transitions]
+    latencies, _ = time_calls(extractor.extract, arguments)
+    cold = summarize(latencies)
+    latencies, _ = time_calls(extractor.extract, arguments)
+    return {"features.extract[cold]": cold, "features.extract[cached]": summarize(latencies)}
+
+
+# Latence de update_q de l'agent approximatif selon le nombre de transitions déjà apprises
+# (la régression linéaire "refit" est réajustée sur tout l'historique à chaque appel)
+def bench_update_q(quick):
+    results = {}
+    checkpoints = (100, 500, 1000) if quick else (100, 1000, 5000)
+    transitions = random_transitions(checkpoints[-1])
+    for learner in ("refit", "td", "rls"):
+        agent = ApproximateQLearningAgent(0.5, 0.8, 0.1, learner=learner)
+        latencies, _ = time_calls(agent.update_q, [(state, move, -1, next_state, None)
+                                                    for state, move, next_state in transitions])
+        for size in checkpoints:
+            window = latencies[max(0, size - 50):size]
+            results[f"update_q.{learner}[X={size}]"] = summarize(window)
+    return results
+
+
+BENCHMARKS = {
+    "generator": bench_generator,
+    "board": bench_board,
+    "train": bench_train,
+    "features": bench_features,
+    "update_q": bench_update_q,
+}
+
+
+# Exécute un groupe de benchmarks dans le processus courant et ajoute le pic de mémoire (RSS)
+def run_group(name, quick):
+    seed_everything(0)
+    results = BENCHMARKS[name](quick)
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Ko sous Linux
+    for result in results.values():
+        result["peak_rss_mb"] = peak_rss_mb
+    return results
+
+
+# Chaque groupe tourne dans un processus neuf, pour que son pic de mémoire lui soit propre
+def run_benchmarks(names, quick=False):
+    results = {}
+    for name in names:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            results.update(executor.submit(run_group, name, quick).result())
+    return results
+
+
+# Benchmarks dont le débit a baissé de plus de threshold (fraction) par rapport à la référence
+# Métriques comparées à la référence : (plus grand est meilleur, unité)
+REGRESSION_METRICS = {"ops_per_sec": (True, "ops/s"), "p99_ms": (False, "ms"), "peak_rss_mb": (False, "Mo")}
+
+
+# Benchmarks dont une métrique s'est dégradée de plus de threshold (fraction) par rapport à la
+# référence : débit en baisse, latence p99 ou pic de mémoire en hausse
+def find_regressions(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        for metric, (higher_is_better, _) in REGRESSION_METRICS.items():
+            if not reference.get(metric) or metric not in result:
+                continue
+            if higher_is_better:
+                regressed = result[metric] < reference[metric] * (1 - threshold)
+            else:
+                regressed = result[metric] > reference[metric] * (1 + threshold)
+            if regressed:
+                regressions.append((name, metric, reference[metric], result[metric]))
+    return regressions
+
+
+def print_results(results, baseline):
+    print(f"{'benchmark':<60} {'ops/s':>12} {'p50 ms':>9} {'p99 ms':>9} {'RSS Mo':>8} {'vs réf.':>8}")
+    for name, result in results.items():
+        reference = baseline.get(name)
+        change = f"{result['ops_per_sec'] / reference['ops_per_sec'] - 1:+.0%}" if reference and reference["ops_per_sec"] else ""
+        print(f"{name:<60} {result['ops_per_sec']:>12.1f} {result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f} "
+              f"{result['peak_rss_mb']:>8.1f} {change:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks des chemins critiques (générateur, plateau, caractéristiques, agents)")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS), help="groupes à exécuter")
+    parser.add_argument("--quick", action="store_true", help="charges réduites")
+    parser.add_argument("--output", default="benchmark_results.json", help="fichier JSON des résultats")
+    parser.add_argument("--baseline", help="résultats JSON de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=0.25, help="dégradation tolérée de chaque métrique (fraction)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.only, args.quick)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["benchmarks"]
+    print_results(results, baseline)
+
+    with open(args.output, "w") as file:
+        json.dump({
+            "meta": {"python": platform.python_version(), "machine": platform.machine(), "quick": args.quick,
+                     "date": time.strftime("%Y-%m-%d %H:%M:%S")},
+            "benchmarks": results,
+        }, file, indent=2)
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for name, metric, reference, current in regressions:
+        unit = REGRESSION_METRICS[metric][1]
+        print(f"Régression : {name} ({metric}) {reference:.4g} -> {current:.4g} {unit}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
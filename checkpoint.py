@@ -0,0 +1,75 @@
+import json
+import os
+import random
+import numpy as np
+
+# Sauvegardes d'un agent en cours d'entraînement : un fichier .npz non compressé (tableaux NumPy
+# lus sans pickle) contenant l'état de l'agent (table Q, modèle, réseau, mémoire de rejeu), epsilon,
+# l'état des générateurs random et np.random et l'avancement fourni par l'appelant.
+# L'agent à restaurer est construit avec les mêmes paramètres que l'agent sauvegardé ; il fournit
+# checkpoint_state() -> (tableaux, métadonnées JSON) et load_checkpoint_state(tableaux, métadonnées).
+CHECKPOINT_VERSION = 1
+CHECKPOINT_EXTENSION = ".ckpt"
+
+
+# Tableaux d'un composant rangés sous un préfixe, et l'inverse
+def prefixed(arrays, prefix):
+    return {prefix + "." + name: array for name, array in arrays.items()}
+
+
+def unprefixed(arrays, prefix):
+    return {name[len(prefix) + 1:]: array for name, array in arrays.items() if name.startswith(prefix + ".")}
+
+
+# État des générateurs aléatoires utilisés par les agents et le plateau (voir seed_everything)
+def rng_state():
+    version, python_state, gauss = random.getstate()
+    name, numpy_state, position, has_gauss, cached_gaussian = np.random.get_state()
+    arrays = {"rng.python": np.array(python_state, dtype=np.uint32), "rng.numpy": numpy_state}
+    return arrays, {"python": [version, gauss], "numpy": [name, int(position), int(has_gauss), float(cached_gaussian)]}
+
+
+def set_rng_state(arrays, meta):
+    version, gauss = meta["python"]
+    random.setstate((version, tuple(arrays["rng.python"].tolist()), gauss))
+    name, position, has_gauss, cached_gaussian = meta["numpy"]
+    np.random.set_state((name, arrays["rng.numpy"], position, has_gauss, cached_gaussian))
+
+
+# Écrit la sauvegarde de agent dans file_name, de façon atomique : le fichier est écrit à côté puis
+# renommé, si bien qu'un arrêt brutal laisse toujours la sauvegarde précédente intacte
+# progress : avancement de l'entraînement (dictionnaire JSON), rendu par load_checkpoint
+def save_checkpoint(file_name, agent, progress=None):
+    arrays, state = agent.checkpoint_state()
+    rng_arrays, rng_meta = rng_state()
+    arrays.update(rng_arrays)
+    meta = {
+        "version": CHECKPOINT_VERSION, "agent": type(agent).__name__, "epsilon": float(agent.epsilon),
+        "epsilon_decay": getattr(agent, "epsilon_decay", None), "state": state, "rng": rng_meta,
+        "progress": progress or {},
+    }
+    arrays["meta"] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+
+    with open(file_name + ".tmp", "wb") as file:
+        np.savez(file, **arrays)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(file_name + ".tmp", file_name)
+
+
+# Restaure dans agent la sauvegarde de file_name, générateurs aléatoires compris, et retourne
+# l'avancement enregistré avec elle
+def load_checkpoint(file_name, agent):
+    with np.load(file_name, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    meta = json.loads(arrays.pop("meta").tobytes())
+    if meta["version"] != CHECKPOINT_VERSION:
+        raise ValueError(f"{file_name} : version de sauvegarde {meta['version']} non prise en charge.")
+    if meta["agent"] != type(agent).__name__:
+        raise ValueError(f"{file_name} : sauvegarde d'un {meta['agent']}, pas d'un {type(agent).__name__}.")
+    agent.load_checkpoint_state(arrays, meta["state"])
+    agent.epsilon = meta["epsilon"]
+    if meta["epsilon_decay"] is not None:
+        agent.epsilon_decay = meta["epsilon_decay"]
+    set_rng_state(arrays, meta["rng"])
+    return meta["progress"]
@@ -3,11 +3,13 @@ import matplotlib.pyplot as plt
 import numpy as np
 from chess import Move
 import random
+from transposition_cache import default_cache
 
 
 class ChessBoard:
-    def __init__(self, fen_board):
+    def __init__(self, fen_board, cache=None):
         self.board = chess.Board(fen_board)
+        self.cache = cache if cache is not None else default_cache  # Cache des coups légaux et des fins de partie par position
     
     def display(self):
         # Créer un tableau de 8x8 pour le plateau
@@ -48,7 +50,7 @@ class ChessBoard:
 
     def get_possible_moves(self):
         # Retourner les mouvements possibles pour le joueur
-        return list(self.board.legal_moves)
+        return self.cache.legal_moves(self.board)
 
     def apply_move(self, move):
         # Appliquer un mouvement sur le plateau
@@ -56,11 +58,11 @@ class ChessBoard:
 
     def is_game_over(self):
         # Vérifier si la partie est terminée
-        return self.board.is_game_over()
+        return self.cache.is_game_over(self.board)
     
     def is_check_mate(self):
         # Vérifier si la partie est terminée par échec et mat
-        return self.board.is_checkmate()
+        return self.cache.is_checkmate(self.board)
 
     def play_move(self, move):
         # Appliquer un mouvement sur le plateau
@@ -68,7 +70,7 @@ class ChessBoard:
     
     def play_random_move(self):
         # Jouer un mouvement aléatoire parmis les mouvements possibles
-        legal_moves = list(self.board.legal_moves)
+        legal_moves = self.cache.legal_moves(self.board)
         
         if legal_moves:
             move = random.choice(legal_moves)
@@ -1,5 +1,9 @@
+import os
 import random
 import chess
+from position_index import PositionIndex, has_mate_in_one
+from position_store import STORE_EXTENSION, write_store
+from tablebase import Tablebase
 
 class ChessBoardGenerator:
     def __init__(self, allowed_pieces=None):
@@ -7,6 +11,30 @@ class ChessBoardGenerator:
             (chess.KING, chess.WHITE), (chess.KING, chess.BLACK),
             (chess.QUEEN, chess.WHITE)
         ]
+        self.index = None  # Index des placements valides, construit à la première utilisation
+        self.tablebase = None  # Table de distance au mat, construite à la première utilisation
+
+    # Construit (ou recharge depuis cache_file) l'index de tous les placements valides du matériel
+    def build_index(self, cache_file=None):
+        if self.index is None:
+            if cache_file is not None and os.path.exists(cache_file):
+                self.index = PositionIndex.load(cache_file, self.allowed_pieces)
+            else:
+                self.index = PositionIndex(self.allowed_pieces)
+                if cache_file is not None:
+                    self.index.save(cache_file)
+        return self.index
+
+    # Construit (ou recharge depuis cache_file) la table de distance au mat du matériel
+    def build_tablebase(self, cache_file=None):
+        if self.tablebase is None:
+            if cache_file is not None and os.path.exists(cache_file):
+                self.tablebase = Tablebase.load(cache_file, self.allowed_pieces)
+            else:
+                self.tablebase = Tablebase(self.allowed_pieces)
+                if cache_file is not None:
+                    self.tablebase.save(cache_file)
+        return self.tablebase
 
     #Génère un plateau permettant un mat en un coup (mate_in_one)
     def generate_winnable_position(self, mate_in_one=True):
@@ -36,19 +64,17 @@ class ChessBoardGenerator:
 
     # Génère un plateau aléatoire avec les pièces autorisées
     def generate_random_position(self):
-        board = chess.Board()
-        board.clear()
-
-        # Parcours de toutes les pièces autorisées et placement sur des cases vides
-        for piece_type, color in self.allowed_pieces:
-            square = random.choice([sq for sq in range(64) if board.piece_at(sq) is None])
-            board.set_piece_at(square, chess.Piece(piece_type, color))
+        while True:
+            board = chess.Board()
+            board.clear()
 
-        # Valider qu'il n'y a pas déjà un mat ou que la partie ne soit pas déjà terminée
-        if not board.is_valid() or board.is_checkmate() or board.is_game_over():
-            return self.generate_random_position()  # Recommence si le plateau initial est invalide
+            # Placement des pièces autorisées sur des cases vides distinctes
+            for (piece_type, color), square in zip(self.allowed_pieces, random.sample(chess.SQUARES, len(self.allowed_pieces))):
+                board.set_piece_at(square, chess.Piece(piece_type, color))
 
-        return board
+            # Valider qu'il n'y a pas déjà un mat ou que la partie ne soit pas déjà terminée, sinon recommencer
+            if board.is_valid() and not board.is_game_over():
+                return board
 
     # Vérifie si deux cases sont adjacentes
     def are_kings_adjacent(self, pos1, pos2):
@@ -62,14 +88,8 @@ class ChessBoardGenerator:
         if board.is_checkmate():
             return False
         
-        # Parcours de tous les mouvements et voir si un échec et mat est possible
-        for move in board.legal_moves:
-            temp_board = board.copy()
-            temp_board.push(move)
-            if temp_board.is_checkmate():
-                return True
-            
-        return False
+        # Parcours des mouvements qui donnent échec et voir si un échec et mat est possible
+        return has_mate_in_one(board)
 
     # Vérifie si un mouvement donné mène à un échec et mat
     def is_checkmate_after_one_move(self, board, move):
@@ -78,18 +98,49 @@ class ChessBoardGenerator:
         return temp_board.is_checkmate()
 
     # Génère une base de données de plateaux et les enregistre dans un fichier texte
-    def generate_database(self, num_positions, file_name, mode="mate_in_one"):
+    # Pour un petit matériel, les positions sont tirées de l'index des placements (seed fixe la
+    # graine, unique évite les doublons) ; sinon elles sont générées une à une
+    # label=True ajoute à chaque ligne la distance au mat en demi-coups (« ; dtm N », -1 sans gain)
+    # Un nom de fichier en .pos produit une base binaire (voir position_store.py) au lieu d'un fichier texte
+    def generate_database(self, num_positions, file_name, mode="mate_in_one", seed=None, unique=False, label=False):
+        if mode not in ("mate_in_one", "random"):
+            raise ValueError("Mode invalide. Utilisez 'mate_in_one' ou 'random'.")
+
+        if PositionIndex.can_index(self.allowed_pieces):
+            fen_strings = self.build_index().sample(num_positions, mode, seed=seed, unique=unique)
+        else:
+            fen_strings = self.generate_fen_strings(num_positions, mode, seed, unique)
+
+        tablebase = self.build_tablebase() if label else None
+        if file_name.endswith(STORE_EXTENSION):
+            labels = [tablebase.probe(board_fen) if tablebase is not None else None for board_fen in fen_strings]
+            write_store(file_name, zip(fen_strings, labels), label)
+            return
         with open(file_name, 'w') as file:
-            for _ in range(num_positions):
-                if mode == "mate_in_one":
-                    board = self.generate_winnable_position(mate_in_one=True)
-                elif mode == "random":
-                    board = self.generate_random_position()
-                else:
-                    raise ValueError("Mode invalide. Utilisez 'mate_in_one' ou 'random'.")
-                board_fen = board.board_fen() + " w - - 0 1"  # Ajouter la partie manquante du FEN
+            for board_fen in fen_strings:
+                if tablebase is not None:
+                    board_fen += f" ; dtm {tablebase.probe(board_fen)}"
                 file.write(board_fen + '\n')  # Sauvegarde les positions en FEN
 
+    # Génération position par position, pour les matériels trop grands pour être indexés
+    def generate_fen_strings(self, num_positions, mode, seed=None, unique=False):
+        if seed is not None:
+            random.seed(seed)
+        fen_strings = []
+        seen = set()
+        while len(fen_strings) < num_positions:
+            if mode == "mate_in_one":
+                board = self.generate_winnable_position(mate_in_one=True)
+            else:
+                board = self.generate_random_position()
+            board_fen = board.board_fen() + " w - - 0 1"  # Ajouter la partie manquante du FEN
+            if unique:
+                if board_fen in seen:
+                    continue
+                seen.add(board_fen)
+            fen_strings.append(board_fen)
+        return fen_strings
+
 
 def main():
     # Génération des plateaux pour les parties simple avec 3 pièces 
@@ -1,9 +1,92 @@
+import bz2
+import gzip
+import hashlib
+import random
+
+
+# Ouvre un fichier de positions en texte, décompressé à la volée pour les extensions .gz et .bz2
+def open_positions(file_name):
+    if file_name.endswith('.gz'):
+        return gzip.open(file_name, 'rt')
+    if file_name.endswith('.bz2'):
+        return bz2.open(file_name, 'rt')
+    return open(file_name, 'r')
+
+
+# Lignes d'un fichier de positions : texte, texte compressé ou base binaire (voir position_store.py)
+def read_positions(file_name):
+    if file_name.endswith('.pos'):
+        from position_store import PositionStore  # Import local : position_store utilise ce module
+        yield from PositionStore(file_name).fens()
+        return
+    with open_positions(file_name) as file:
+        yield from file
+
+
+# Extrait la FEN d'une ligne FEN ou EPD, ou None pour une ligne vide
+# Un éventuel label (« ; dtm N ») ou les opérations EPD (« bm Qh8#; id "..." ») sont ignorés ;
+# une position EPD, sans compteurs de coups, reçoit « 0 1 »
+def parse_position(line):
+    fields = line.split(';')[0].split()
+    if len(fields) < 4:
+        return None
+    if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit():
+        return ' '.join(fields[:6])
+    return ' '.join(fields[:4] + ['0', '1'])
+
+
+# Condensé stable (indépendant du processus) du placement des pièces d'une FEN
+def placement_hash(fen_string):
+    return int.from_bytes(hashlib.blake2b(fen_string.split(' ', 1)[0].encode(), digest_size=8).digest(), 'little')
+
+
+# Matériel d'une FEN : lettres des pièces triées (« KQk » pour roi et dame contre roi)
+def material_signature(fen_string):
+    return ''.join(sorted(symbol for symbol in fen_string.split(' ', 1)[0] if symbol.isalpha()))
+
+
+# Parcourt les positions d'un fichier sans le charger en mémoire
+# - shard, nb_shards : ne garde que la part shard sur nb_shards ; la répartition se fait sur le
+#   placement, donc toutes les copies d'une position tombent dans la même part
+# - unique : ignore un placement déjà rencontré (garde un condensé de 8 octets par placement distinct)
+# - material : ne garde que les positions de ce matériel (lettres des pièces dans un ordre quelconque)
+def iter_positions(file_name, shard=0, nb_shards=1, unique=False, material=None):
+    if not 0 <= shard < nb_shards:
+        raise ValueError("Part invalide. Utilisez 0 <= shard < nb_shards.")
+    material = ''.join(sorted(material)) if material is not None else None
+    seen = set()
+    for line in read_positions(file_name):
+        fen_string = parse_position(line)
+        if fen_string is None:
+            continue
+        if material is not None and material_signature(fen_string) != material:
+            continue
+        if nb_shards > 1 or unique:
+            key = placement_hash(fen_string)
+            if key % nb_shards != shard:
+                continue
+            if unique:
+                if key in seen:
+                    continue
+                seen.add(key)
+        yield fen_string
+
+
+# Tire k positions uniformément en un seul passage (échantillonnage par réservoir) ; les filtres
+# de iter_positions s'appliquent avant le tirage
+def sample_positions(file_name, k, seed=None, **filters):
+    rng = random.Random(seed)
+    reservoir = []
+    for index, fen_string in enumerate(iter_positions(file_name, **filters)):
+        if index < k:
+            reservoir.append(fen_string)
+        else:
+            slot = rng.randrange(index + 1)
+            if slot < k:
+                reservoir[slot] = fen_string
+    return reservoir
+
+
 #Lit un fichier texte contenant des positions FEN et renvoie les chaînes FEN
 def load_positions_from_file(file_name):
-    fen_strings = []
-    with open(file_name, 'r') as file:
-        for line in file:
-            line = line.strip()
-            if line:
-                fen_strings.append(line)  # Ajoute la chaîne FEN à la liste
-    return fen_strings
+    return list(iter_positions(file_name))
@@ -0,0 +1,8 @@
+from agent_deep_q_learning import DeepQLearningAgent
+from experiment_runner import make_test
+
+
+# Test des agents de Deep Q-learning (voir experiment_runner.make_test)
+def make_deep_q_learning_test(all_fen, episodes, nb_episodes, workers=1, seed=None, results_file=None):
+    return make_test(DeepQLearningAgent, all_fen, episodes, nb_episodes,
+                     workers=workers, seed=seed, results_file=results_file)
@@ -0,0 +1,98 @@
+import chess
+from transposition_cache import default_cache, transposition_key
+
+# Décroissance d'epsilon par épisode, sauf si l'agent définit son propre epsilon_decay
+EPSILON_DECAY = 0.995
+
+
+class EpisodeEngine:
+    def __init__(self, cache=None):
+        self.board = chess.Board()  # Plateau unique, réutilisé d'un épisode à l'autre
+        self.cache = cache if cache is not None else default_cache  # Cache des coups légaux et des fins de partie
+        self.root_fen = None  # Position de départ actuellement chargée
+        self.instrumentation = None  # Instrumentation optionnelle (voir instrumentation.py)
+
+    # Ramène le plateau sur la position de départ : pop() si elle est déjà chargée, sinon lecture de la FEN
+    def reset(self, fen_string):
+        if fen_string == self.root_fen:
+            while self.board.move_stack:
+                self.board.pop()
+        else:
+            self.board.set_fen(fen_string)
+            self.root_fen = fen_string
+        return self.board
+
+    # Entraînement d'un agent sur un certain nombre d'épisodes sur un plateau fen
+    # L'agent fournit state_key(board), calculé une seule fois par demi-coup, et les méthodes
+    # choose_action, get_best_move et update_q qui reçoivent ces clés.
+    # Retourne le nombre de mises à jour de la table Q (ou du modèle) effectuées.
+    def train(self, agent, episodes, fen_string):
+        probe = self.instrumentation
+        if probe is None:
+            return self.run_episodes(agent, self.cache, episodes, fen_string, None)
+        agent, cache = probe.wrap_training(agent, self.cache)
+        try:
+            return self.run_episodes(agent, cache, episodes, fen_string, probe)
+        finally:
+            probe.unwrap_training()
+
+    # Boucle d'entraînement de train, avec l'agent et le cache éventuellement chronométrés par probe
+    def run_episodes(self, agent, cache, episodes, fen_string, probe):
+        # Si la table Q possède déjà des valeurs pour cet état, jouer le meilleur coup
+        board = self.reset(fen_string)
+        action = agent.get_best_move(agent.state_key(board), cache.legal_moves(board))
+        board.push(action)
+        still_mat_in_Q = cache.is_game_over(board)
+        board.pop()
+
+        if still_mat_in_Q:
+            return 0
+
+        decay = getattr(agent, "epsilon_decay", EPSILON_DECAY)
+        steps = 0
+        for episode in range(episodes):
+            if probe is not None:
+                probe.episode_started()
+            board = self.reset(fen_string)
+            state = agent.state_key(board)
+            done = False
+            position_history = set()
+
+            while not done:
+                possible_actions = cache.legal_moves(board)
+                best_move = agent.choose_action(state, possible_actions)
+                board.push(best_move)
+
+                # Vérifier la répétition de positions ; les compteurs font partie de la clé,
+                # comme dans la FEN utilisée auparavant, pour garder la même règle d'arrêt
+                position_hash = (transposition_key(board), board.halfmove_clock, board.fullmove_number)
+                if position_hash in position_history:
+                    reward = -10  # Pénalité pour répétition
+                    break  # Sortir de la boucle
+                position_history.add(position_hash)
+
+                next_state = agent.state_key(board)
+                reward = -1
+
+                # Vérifier si la partie est terminée
+                if board.halfmove_clock >= 50:
+                    reward = -50  # Pénalité pour la règle des 50 coups
+                    done = True
+                elif cache.is_game_over(board):
+                    reward = 100  # Récompense positive pour la victoire
+                    done = True
+
+                agent.update_q(state, best_move, reward, next_state, possible_actions)
+                steps += 1
+                state = next_state
+
+            # Décrémenter epsilon pour favoriser l'exploitation au fil des épisodes
+            agent.epsilon = max(0.01, agent.epsilon * decay)
+            if probe is not None:
+                probe.episode_finished()
+
+        return steps
+
+
+# Un plateau par processus : chaque worker d'un ProcessPoolExecutor a son propre moteur
+default_engine = EpisodeEngine()
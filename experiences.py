@@ -1,19 +1,35 @@
+import argparse
+import os
 import matplotlib.pyplot as plt
 import numpy as np
-from chess_board_loader import load_positions_from_file
-from q_learning_appro_test import make_appro_q_learning_test
-from q_learning_test import make_q_learning_test
+from agent_approximate_q_learning import ApproximateQLearningAgent
+from agent_deep_q_learning import DeepQLearningAgent
 from agent_q_learning import QLearningAgent
+from results_cache import ResultsCache
 
 # Fichiers de positions
 mate_in_one_positions_3_pieces = 'mate_in_one_positions_3_pieces.txt'
 random_positions_3_pieces = 'random_positions_3_pieces.txt'
 random_positions_6_pieces = 'random_positions_6_pieces.txt'
 
+# Dossier où enregistrer les figures en mode sans affichage (None : affichage interactif)
+output_dir = None
 
-def plot_q_learning_results(mates_found_per_agent, episodes, nb_episodes, agents):
+
+def show_figure(file_name):
+    """
+    Affiche la figure courante, ou l'enregistre dans output_dir en mode sans affichage.
+    """
+    if output_dir is None:
+        plt.show()
+    else:
+        plt.savefig(os.path.join(output_dir, file_name))
+        plt.close()
+
+
+def plot_q_learning_results(mates_found_per_agent, episodes, nb_episodes, agents, file_name='q_learning_results.png'):
     """
-    Charge les positions FEN depuis un fichier, exécute les tests de Q-learning et affiche les résultats.
+    Affiche le nombre de mats trouvés par chaque agent de Q-learning à chaque tour.
     """
     for idx, mates_found in enumerate(mates_found_per_agent):
         label = f'Agent {idx + 1} (α={agents[idx].alpha}, γ={agents[idx].gamma}, ε={agents[idx].epsilon})'
@@ -23,10 +39,10 @@ def plot_q_learning_results(mates_found_per_agent, episodes, nb_episodes, agents
     plt.ylabel('Nombre de mats trouvés')
     plt.title('Nombre de mats trouvés')
     plt.legend()
-    plt.show()
+    show_figure(file_name)
 
 
-def compare_agents_performance(agent_approx_10_10, agent_normaux_10_10):
+def compare_agents_performance(agent_approx_10_10, agent_normaux_10_10, file_name='compare_agents.png'):
     """
     Compare les performances des agents approximatifs et normaux et affiche un box plot.
     """
@@ -40,12 +56,12 @@ def compare_agents_performance(agent_approx_10_10, agent_normaux_10_10):
     plt.ylabel('Nombre de mats trouvés')
     plt.title('Comparaison des performances des agents approximatifs et normaux')
     plt.grid(True)
-    plt.show()
+    show_figure(file_name)
 
 def cumulative_average(data):
     return np.cumsum(data) / (np.arange(len(data)) + 1)
 
-def plot_cumulative_average(agent_approx, agent_normaux):
+def plot_cumulative_average(agent_approx, agent_normaux, file_name='cumulative_average.png'):
     """
     Affiche l'évolution de la performance des agents à travers les épisodes sous forme de moyenne cumulative.
     """
@@ -63,10 +79,11 @@ def plot_cumulative_average(agent_approx, agent_normaux):
     plt.title('Évolution de la performance des agents à travers les épisodes')
     plt.legend()
     plt.grid(True)
-    plt.show()
+    show_figure(file_name)
 
 
-def extended_compare_agents_performance(agent_approx_10_10, agent_normaux_10_10, agent_normaux_10_100):
+def extended_compare_agents_performance(agent_approx_10_10, agent_normaux_10_10, agent_normaux_10_100,
+                                        file_name='extended_compare_agents.png'):
     """
     Compare les performances des agents approximatifs et normaux sur plus d'épisodes et affiche un box plot.
     """
@@ -85,10 +102,51 @@ def extended_compare_agents_performance(agent_approx_10_10, agent_normaux_10_10,
     plt.grid(True)
     plt.xticks(rotation=45)
     plt.tight_layout()
-    plt.show()
+    show_figure(file_name)
+
+
+def compare_agent_types_performance(mates_per_agent_type, file_name='compare_agent_types.png'):
+    """
+    Compare les performances de plusieurs types d'agents (nom -> mats trouvés par agent) et affiche un box plot.
+    """
+    data, labels = [], []
+    for agent_type, mates_found_per_agent in mates_per_agent_type.items():
+        for idx, mates_found in enumerate(mates_found_per_agent):
+            data.append(mates_found)
+            labels.append(f'Agent {agent_type} {idx + 1}')
+
+    plt.figure(figsize=(12, 7))
+    plt.boxplot(data, labels=labels)
+
+    plt.ylabel('Nombre de mats trouvés')
+    plt.title('Comparaison des performances des agents normaux, approximatifs et profonds')
+    plt.grid(True)
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    show_figure(file_name)
 
 
-def main():
+def main(argv=None):
+    global output_dir
+
+    parser = argparse.ArgumentParser(description="Expériences de Q-learning sur les finales d'échecs")
+    parser.add_argument("--headless", action="store_true", help="enregistrer les figures au lieu de les afficher")
+    parser.add_argument("--output-dir", default="figures", help="dossier des figures en mode --headless")
+    parser.add_argument("--cache-dir", default="results_cache", help="dossier du cache des résultats")
+    parser.add_argument("--seed", type=int, default=None, help="graine des expériences")
+    parser.add_argument("--workers", type=int, default=1, help="nombre de processus pour les expériences")
+    parser.add_argument("--checkpoint-every", type=float, default=None,
+                        help="sauvegarder les agents en cours au plus toutes les N secondes, pour reprendre après un arrêt")
+    args = parser.parse_args(argv)
+
+    if args.headless:
+        plt.switch_backend("Agg")  # Backend sans affichage
+        output_dir = args.output_dir
+        os.makedirs(output_dir, exist_ok=True)
+
+    # Les résultats sont lus dans le cache ; seules les expériences absentes sont calculées
+    cache = ResultsCache(args.cache_dir, workers=args.workers, seed=args.seed, checkpoint_every=args.checkpoint_every)
+
     agents = [
         QLearningAgent(alpha=0.3, gamma=0.7, epsilon=0.5),  # Agent 1 : fort taux d'exploration
         QLearningAgent(alpha=0.1, gamma=0.95, epsilon=0.2), # Agent 2 : équilibre exploration/exploitation
@@ -99,41 +157,44 @@ def main():
     # ======= 3 pièces =======
 
     # Plot Q-learning 3 pièces avec les plateaux pour mettre mat en un coup
-    all_fen = load_positions_from_file(mate_in_one_positions_3_pieces)
-    mates_found_per_agent = make_q_learning_test(all_fen, 5, 10)
-    plot_q_learning_results(mates_found_per_agent, 5, 10, agents)
+    mates_found_per_agent = cache.mates(mate_in_one_positions_3_pieces, QLearningAgent, 5, 10)
+    plot_q_learning_results(mates_found_per_agent, 5, 10, agents, '3_pieces_mate_in_one.png')
     
     # Plot Q-learning 3 pièces avec des plateaux aleatoires
-    all_fen = load_positions_from_file(random_positions_3_pieces)
-    mates_found_per_agent = make_q_learning_test(all_fen, 5, 10)
-    plot_q_learning_results(mates_found_per_agent, 5, 10, agents)
+    mates_found_per_agent = cache.mates(random_positions_3_pieces, QLearningAgent, 5, 10)
+    plot_q_learning_results(mates_found_per_agent, 5, 10, agents, '3_pieces_random.png')
 
 
     # Compare les performances des agents approximatifs et normaux
-    all_fen = load_positions_from_file(random_positions_3_pieces)
-    agent_approx_10_10 = make_appro_q_learning_test(all_fen, 10, 10)
-    agent_normaux_10_10 = make_q_learning_test(all_fen, 10, 10)
-    compare_agents_performance(agent_approx_10_10, agent_normaux_10_10)
+    agent_approx_10_10 = cache.mates(random_positions_3_pieces, ApproximateQLearningAgent, 10, 10)
+    agent_normaux_10_10 = cache.mates(random_positions_3_pieces, QLearningAgent, 10, 10)
+    compare_agents_performance(agent_approx_10_10, agent_normaux_10_10, '3_pieces_compare_agents.png')
 
 
     # Plot agent approximatif vs agent normal 10-10
-    plot_cumulative_average(agent_approx_10_10, agent_normaux_10_10)
+    plot_cumulative_average(agent_approx_10_10, agent_normaux_10_10, '3_pieces_cumulative_average_10_10.png')
 
     # Plot agent approximatif vs agent normal 10-100
-    agent_normaux_10_100 = make_q_learning_test(all_fen, 100, 10)
-    plot_cumulative_average(agent_approx_10_10, agent_normaux_10_100)
+    agent_normaux_10_100 = cache.mates(random_positions_3_pieces, QLearningAgent, 100, 10)
+    plot_cumulative_average(agent_approx_10_10, agent_normaux_10_100, '3_pieces_cumulative_average_10_100.png')
 
     # Plot agent approximatif vs agent normal 10-10 vs agent normal 10-100 
-    extended_compare_agents_performance(agent_approx_10_10, agent_normaux_10_10, agent_normaux_10_100)
+    extended_compare_agents_performance(agent_approx_10_10, agent_normaux_10_10, agent_normaux_10_100,
+                                        '3_pieces_extended_compare_agents.png')
 
 
     # ======= 6 pièces =======
-    all_fen = load_positions_from_file(random_positions_6_pieces)
-    agent_approx_10_10 = make_appro_q_learning_test(all_fen, 10, 10)
-    agent_normaux_10_10 = make_q_learning_test(all_fen, 10, 10)
-    agent_normaux_10_100 = make_q_learning_test(all_fen, 100, 10)
+    agent_approx_10_10 = cache.mates(random_positions_6_pieces, ApproximateQLearningAgent, 10, 10)
+    agent_normaux_10_10 = cache.mates(random_positions_6_pieces, QLearningAgent, 10, 10)
+    agent_normaux_10_100 = cache.mates(random_positions_6_pieces, QLearningAgent, 100, 10)
+
+    extended_compare_agents_performance(agent_approx_10_10, agent_normaux_10_10, agent_normaux_10_100,
+                                        '6_pieces_extended_compare_agents.png')
 
-    extended_compare_agents_performance(agent_approx_10_10, agent_normaux_10_10, agent_normaux_10_100)
+    # Agent profond (réseau de neurones) face aux agents normaux et approximatifs
+    agent_deep_10_10 = cache.mates(random_positions_6_pieces, DeepQLearningAgent, 10, 10)
+    compare_agent_types_performance({'normal': agent_normaux_10_10, 'approx': agent_approx_10_10,
+                                     'deep': agent_deep_10_10}, '6_pieces_compare_agent_types.png')
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from checkpoint import CHECKPOINT_EXTENSION, load_checkpoint, save_checkpoint
+from chess_board import ChessBoard
+from episode_engine import default_engine
+
+# Liste des configurations d'agents
+AGENT_CONFIGURATIONS = [
+    {"alpha": 0.3, "gamma": 0.7, "epsilon": 0.5},  # Agent 1 : fort taux d'exploration
+    {"alpha": 0.1, "gamma": 0.95, "epsilon": 0.2}, # Agent 2 : équilibre exploration/exploitation
+    {"alpha": 0.5, "gamma": 0.8, "epsilon": 0.1},   # Agent 3 : forte exploitation
+]
+
+
+# Graine déterministe d'un tour d'entraînement/évaluation pour un couple (FEN, configuration d'agent)
+def job_seed(seed, round_idx, fen_idx, agent_idx):
+    return int(np.random.SeedSequence([seed, round_idx, fen_idx, agent_idx]).generate_state(1)[0])
+
+
+# Initialise les générateurs aléatoires utilisés par les agents et le plateau
+def seed_everything(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+# Identifiant d'une expérience : deux lancements avec les mêmes paramètres partagent leurs résultats
+def experiment_id(agent_class, all_fen, episodes, nb_episodes, agent_configurations, seed):
+    description = json.dumps([agent_class.__name__, list(all_fen), episodes, nb_episodes,
+                              agent_configurations, seed], sort_keys=True)
+    return hashlib.sha1(description.encode()).hexdigest()[:16]
+
+
+# Joue une partie d'évaluation : l'agent joue son meilleur coup, l'adversaire joue au hasard
+# Retourne l'issue ("mate" si la partie se termine, "fifty" si la règle des 50 coups s'applique)
+# et le nombre de demi-coups joués
+def play_evaluation_game(agent, fen_string, instrumentation=None):
+    chess_board = ChessBoard(fen_string)
+    if instrumentation is not None:
+        agent, chess_board = instrumentation.wrap_evaluation(agent, chess_board)
+    plies = 0
+
+    while True:
+        # L'agent joue son meilleur coup
+        possible_actions = list(chess_board.get_possible_moves())
+        best_move = agent.get_best_move(chess_board.get_fen(), possible_actions)
+        chess_board.apply_move(best_move)
+        plies += 1
+
+        # Vérifier si l'agent a gagné
+        if chess_board.is_check_mate() or chess_board.is_game_over():
+            return "mate", plies
+
+        if chess_board.get_is_fifty_moves():
+            return "fifty", plies
+
+        # L'adversaire joue un coup aléatoire
+        chess_board.play_random_move()
+        plies += 1
+        if chess_board.is_check_mate() or chess_board.is_game_over():
+            return "mate", plies
+
+
+# Un tour : entraînement de l'agent puis partie d'évaluation, avec une graine propre au tour si demandée
+# Retourne l'enregistrement de la partie
+def run_round(agent, fen_string, episodes, seed, round_idx, fen_idx, agent_idx):
+    if seed is not None:
+        seed_everything(job_seed(seed, round_idx, fen_idx, agent_idx))
+    start = time.perf_counter()
+    training_steps = agent.train(episodes, fen_string)
+    trained = time.perf_counter()
+    outcome, plies = play_evaluation_game(agent, fen_string, default_engine.instrumentation)
+    end = time.perf_counter()
+    return {
+        "round": round_idx, "fen_idx": fen_idx, "fen": fen_string, "agent_idx": agent_idx,
+        "outcome": outcome, "plies": plies, "training_steps": training_steps,
+        "train_time": trained - start, "eval_time": end - trained, "wall_time": end - start,
+    }
+
+
+# Ajoute un enregistrement à la fin du fichier JSONL ; une ligne courte écrite en mode ajout
+# reste entière même si plusieurs processus écrivent dans le même fichier
+def append_record(results_file, record):
+    with open(results_file, "a") as file:
+        file.write(json.dumps(record) + "\n")
+        file.flush()
+
+
+# Enregistrements d'une expérience déjà présents dans le fichier
+# Une dernière ligne tronquée par un arrêt brutal est retirée du fichier avant la reprise
+def load_records(results_file, experiment):
+    records = []
+    if results_file is None or not os.path.exists(results_file):
+        return records
+    with open(results_file, "rb+") as file:
+        content = file.read()
+        end = content.rfind(b"\n") + 1
+        if end < len(content):
+            file.truncate(end)
+    for line in content[:end].decode().splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if record.get("experiment") == experiment:
+            records.append(record)
+    return records
+
+
+# Tâche d'un processus : tous les tours d'un agent sur une position FEN
+# Chaque partie est écrite dans results_file dès qu'elle est terminée, sauf si elle l'était déjà
+# Avec checkpoint_dir, l'agent est sauvegardé après un tour si checkpoint_every secondes se sont
+# écoulées depuis la dernière sauvegarde ; une tâche relancée reprend au tour qui suit la sauvegarde
+# (les parties des tours précédents sont déjà dans results_file), et la sauvegarde est supprimée
+# quand la tâche est terminée
+def run_agent_job(agent_class, config, fen_string, fen_idx, agent_idx, episodes, nb_episodes, seed,
+                  results_file=None, experiment=None, completed=frozenset(), checkpoint_dir=None,
+                  checkpoint_every=0.0):
+    if seed is not None:
+        seed_everything(job_seed(seed, 0, fen_idx, agent_idx))  # Poids initiaux reproductibles (agent profond)
+    agent = agent_class(**config)
+    records = []
+    first_round = 0
+    checkpoint_file = None
+    if checkpoint_dir is not None:
+        checkpoint_file = os.path.join(checkpoint_dir, f"{experiment}_{fen_idx}_{agent_idx}{CHECKPOINT_EXTENSION}")
+        if os.path.exists(checkpoint_file):
+            first_round = load_checkpoint(checkpoint_file, agent)["round"]
+    last_checkpoint = time.perf_counter()
+
+    for round_idx in range(first_round, nb_episodes):
+        record = run_round(agent, fen_string, episodes, seed, round_idx, fen_idx, agent_idx)
+        record.update(experiment=experiment, agent=agent_class.__name__, config=config, seed=seed)
+        if results_file is not None and (round_idx, fen_idx, agent_idx) not in completed:
+            append_record(results_file, record)
+        records.append(record)
+        if (checkpoint_file is not None and round_idx + 1 < nb_episodes
+                and time.perf_counter() - last_checkpoint >= checkpoint_every):
+            save_checkpoint(checkpoint_file, agent, {"round": round_idx + 1})
+            last_checkpoint = time.perf_counter()
+
+    if checkpoint_file is not None and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+    return records
+
+
+# Entraîne et évalue une classe d'agent sur toutes les positions FEN, pour chaque configuration
+# - workers > 1 répartit les couples (FEN, configuration) sur un ProcessPoolExecutor
+# - avec une graine fixée, chaque tour est réinitialisé avec sa propre graine : le résultat ne dépend
+#   ni du nombre de workers ni d'une éventuelle reprise
+# - results_file reçoit une ligne JSON par partie ; relancer la même expérience sur le même fichier
+#   saute les couples (FEN, configuration) déjà terminés. Un couple interrompu est rejoué depuis le
+#   premier tour (sans réécrire les parties déjà enregistrées), faute d'avoir gardé l'agent entraîné.
+# - checkpoint_dir garde l'agent entraîné de chaque couple en cours (voir run_agent_job et
+#   checkpoint.py) : un couple interrompu reprend alors depuis sa dernière sauvegarde
+def run_experiment(agent_class, all_fen, episodes, nb_episodes, agent_configurations, workers=1, seed=None,
+                   results_file=None, checkpoint_dir=None, checkpoint_every=0.0):
+    if checkpoint_dir is not None:
+        if results_file is None:
+            raise ValueError("Reprise invalide. Utilisez checkpoint_dir avec results_file.")
+        os.makedirs(checkpoint_dir, exist_ok=True)
+    # Comme l'ancien dictionnaire d'agents par FEN, une position dupliquée n'est jouée qu'une fois
+    all_fen = list(dict.fromkeys(all_fen))
+    experiment = experiment_id(agent_class, all_fen, episodes, nb_episodes, agent_configurations, seed)
+    records = load_records(results_file, experiment)
+    completed = frozenset((record["round"], record["fen_idx"], record["agent_idx"]) for record in records)
+
+    jobs = [
+        (agent_class, config, fen_string, fen_idx, agent_idx, episodes, nb_episodes, seed,
+         results_file, experiment, completed, checkpoint_dir, checkpoint_every)
+        for fen_idx, fen_string in enumerate(all_fen)
+        for agent_idx, config in enumerate(agent_configurations)
+        if any((round_idx, fen_idx, agent_idx) not in completed for round_idx in range(nb_episodes))
+    ]
+    print(f"{len(all_fen)} FEN x {len(agent_configurations)} agents : {len(jobs)} à jouer")
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(run_agent_job, *zip(*jobs)) if jobs else []
+            new_records = [record for job_records in results for record in job_records]
+    else:
+        new_records = []
+        for job in jobs:
+            job_records = run_agent_job(*job)
+            new_records.extend(job_records)
+            print(f"FEN {job[3] + 1} - Agent {job[4] + 1} : {[record['outcome'] for record in job_records]}")
+
+    # Les parties déjà enregistrées priment sur celles rejouées
+    games = {(record["round"], record["fen_idx"], record["agent_idx"]): record for record in new_records}
+    games.update({(record["round"], record["fen_idx"], record["agent_idx"]): record for record in records})
+
+    # Liste pour stocker le nombre de mats trouvés à chaque nombre d'épisodes pour chaque agent
+    mates_found_per_agent = [[0 for f in range(nb_episodes)] for _ in range(len(agent_configurations))]
+    games_ended_in_50_moves = [[0 for f in range(nb_episodes)] for _ in range(len(agent_configurations))]
+    for record in games.values():
+        if record["outcome"] == "mate":
+            mates_found_per_agent[record["agent_idx"]][record["round"]] += 1
+        elif record["outcome"] == "fifty":
+            games_ended_in_50_moves[record["agent_idx"]][record["round"]] += 1
+
+    return mates_found_per_agent, games_ended_in_50_moves
+
+
+# Test commun à tous les types d'agents : retourne le nombre de mats trouvés par configuration et par tour
+def make_test(agent_class, all_fen, episodes, nb_episodes, workers=1, seed=None, results_file=None,
+              agent_configurations=AGENT_CONFIGURATIONS):
+    mates_found_per_agent, games_ended_in_50_moves = run_experiment(
+        agent_class, all_fen, episodes, nb_episodes, agent_configurations,
+        workers=workers, seed=seed, results_file=results_file)
+
+    print(mates_found_per_agent)
+    print(games_ended_in_50_moves)
+    return mates_found_per_agent
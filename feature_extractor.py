@@ -0,0 +1,101 @@
+import chess
+import numpy as np
+from transposition_cache import default_cache, transposition_key
+
+# Noms des caractéristiques, dans l'ordre des colonnes retournées
+FEATURE_NAMES = (
+    "king_distance",        # Distance (de Chebyshev) entre les deux rois
+    "queen_distance",       # Distance entre la dame blanche et le roi noir (8 sans dame)
+    "black_king_mobility",  # Nombre de cases où le roi noir peut aller
+    "check",                # Le roi au trait est en échec
+    "black_king_edge",      # Distance du roi noir au bord le plus proche
+    "checkmate",            # Échec et mat
+    "stalemate",            # Pat
+    "queen_hanging",        # La dame est attaquée par le roi noir et non défendue
+    "black_pawns",          # Nombre de pions noirs
+    "queen_present",        # La dame blanche est encore sur le plateau
+)
+
+
+class FeatureExtractor:
+    def __init__(self, cache_size=200000, transposition_cache=None):
+        self.cache_size = cache_size  # Nombre maximal de lignes gardées en cache
+        self.cache = {}  # (clé de position, coup) -> caractéristiques
+        self.boards = {}  # FEN -> plateau déjà analysé
+        self.transposition_cache = transposition_cache if transposition_cache is not None else default_cache  # Mats et pats par position
+
+    # Retourne un chess.Board vivant pour un état donné sous forme de FEN ou de plateau
+    def get_board(self, state):
+        if isinstance(state, chess.Board):
+            return state
+        board = self.boards.get(state)
+        if board is None:
+            if len(self.boards) >= self.cache_size:
+                self.boards.clear()
+            board = self.boards[state] = chess.Board(state)
+        return board
+
+    # Coups légaux d'un état, lus dans le cache de transpositions
+    def legal_moves(self, state):
+        return self.transposition_cache.legal_moves(self.get_board(state))
+
+    # Caractéristiques de la position obtenue après avoir joué action depuis state
+    def extract(self, state, action):
+        board = self.get_board(state)
+        key = (transposition_key(board), action)
+        features = self.cache.get(key)
+        if features is None:
+            # Jouer puis annuler le coup sur le plateau vivant, sans copie
+            board.push(action)
+            features = self.position_features(board)
+            board.pop()
+            if len(self.cache) >= self.cache_size:
+                self.cache.clear()
+            self.cache[key] = features
+        return features
+
+    # Matrice des caractéristiques de toutes les actions d'un état (une ligne par action)
+    def extract_batch(self, state, actions):
+        board = self.get_board(state)
+        return np.array([self.extract(board, action) for action in actions])
+
+    # Calcule les caractéristiques d'une position directement à partir des bitboards
+    def position_features(self, board):
+        white_king = board.king(chess.WHITE)
+        black_king = board.king(chess.BLACK)
+        queens = board.pieces_mask(chess.QUEEN, chess.WHITE)
+        queen = chess.lsb(queens) if queens else None
+
+        # Cases accessibles au roi noir : ni occupées par ses pièces, ni attaquées par les blancs
+        # (le roi est retiré de l'occupation pour que la dame « voie » à travers lui)
+        occupied = board.occupied & ~chess.BB_SQUARES[black_king]
+        mobility = 0
+        for square in chess.scan_forward(chess.BB_KING_ATTACKS[black_king] & ~board.occupied_co[chess.BLACK]):
+            if not board.attackers_mask(chess.WHITE, square, occupied):
+                mobility += 1
+
+        # Mat et pat ne sont possibles que si le roi noir est bloqué
+        checkmate = stalemate = False
+        if mobility == 0:
+            checkmate = self.transposition_cache.is_checkmate(board)
+            stalemate = self.transposition_cache.is_stalemate(board)
+
+        queen_hanging = (
+            queen is not None
+            and bool(chess.BB_KING_ATTACKS[black_king] & queens)
+            and not board.attackers_mask(chess.WHITE, queen)
+        )
+
+        file, rank = chess.square_file(black_king), chess.square_rank(black_king)
+        return np.array([
+            chess.square_distance(white_king, black_king),
+            chess.square_distance(queen, black_king) if queen is not None else 8,
+            mobility,
+            board.is_check(),
+            min(file, 7 - file, rank, 7 - rank),
+            checkmate,
+            stalemate,
+            queen_hanging,
+            chess.popcount(board.pieces_mask(chess.PAWN, chess.BLACK)),
+            queen is not None,
+        ], dtype=float)
@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import json
+import socket
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import chess
+import numpy as np
+from agent_approximate_q_learning import ApproximateQLearningAgent
+from agent_deep_q_learning import DeepQLearningAgent
+from agent_q_learning import QLearningAgent
+from checkpoint import load_checkpoint
+
+# Service local de meilleur coup pour un agent entraîné : une requête par ligne JSON,
+#     {"id": 1, "fen": "...", "q_values": true}
+# une réponse par ligne JSON, dans l'ordre où elles sont prêtes (l'id sert à les associer),
+#     {"id": 1, "fen": "...", "move": "h1h8", "q_values": {"h1h8": 100.0, ...}}
+# "move" vaut null si la position n'a aucun coup légal ; {"stats": true} retourne les métriques.
+AGENT_CLASSES = {"q_learning": QLearningAgent, "approx": ApproximateQLearningAgent, "deep": DeepQLearningAgent}
+DEFAULT_PORT = 8765
+
+
+# Construit un agent et y charge une sauvegarde (voir checkpoint.py)
+def load_agent(agent_name, config=None, checkpoint_file=None):
+    agent = AGENT_CLASSES[agent_name](**(config or {}))
+    if checkpoint_file is not None:
+        load_checkpoint(checkpoint_file, agent)
+    return agent
+
+
+# Valeurs Q des coups de plusieurs plateaux : un seul appel au modèle pour les agents qui ont une
+# version par lot, une lecture de la table par plateau pour le Q-learning tabulaire (sans créer
+# d'entrée, contrairement à get_best_move)
+def score_batch(agent, boards, moves_list):
+    if hasattr(agent, "get_q_values_batch"):
+        return agent.get_q_values_batch(boards, moves_list)
+    return [np.asarray(agent.Q.q_values(agent.state_key(board), moves), dtype=float)
+            for board, moves in zip(boards, moves_list)]
+
+
+class InferenceServer:
+    # max_batch : positions évaluées au plus par appel au modèle
+    # max_wait : attente maximale (secondes) d'autres requêtes après la première d'un lot
+    # cache_size : réponses gardées en cache, vidé quand il est plein
+    def __init__(self, agent, max_batch=64, max_wait=0.002, cache_size=100000):
+        self.agent = agent
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.cache_size = cache_size
+        self.cache = {}  # FEN -> réponse
+        self.queue = asyncio.Queue()  # (FEN, futur) en attente d'évaluation
+        self.executor = ThreadPoolExecutor(max_workers=1)  # Évaluation hors de la boucle d'événements
+        self.latencies = deque(maxlen=10000)  # Dernières latences de bout en bout (secondes)
+        self.requests = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.scored = 0  # Positions évaluées par le modèle
+        self.start = time.perf_counter()
+
+    # Réponses (meilleur coup et valeurs Q) pour des FEN distinctes, exécuté dans self.executor
+    def score(self, fens):
+        results = {}
+        boards, moves_list, valid = [], [], []
+        for fen_string in fens:
+            try:
+                board = chess.Board(fen_string)
+            except ValueError:
+                results[fen_string] = {"fen": fen_string, "error": "FEN invalide."}
+                continue
+            if not board.is_valid():  # Rois manquants, camp qui ne joue pas en échec...
+                results[fen_string] = {"fen": fen_string, "error": "Position invalide."}
+                continue
+            boards.append(board)
+            moves_list.append(list(board.legal_moves))
+            valid.append(fen_string)
+        for fen_string, moves, q_values in zip(valid, moves_list, score_batch(self.agent, boards, moves_list)):
+            # Premier maximum, comme QLearningAgent.get_best_move : réponse déterministe
+            results[fen_string] = {
+                "fen": fen_string,
+                "move": moves[int(np.argmax(q_values))].uci() if moves else None,
+                "q_values": {move.uci(): float(value) for move, value in zip(moves, q_values)},
+            }
+        return results
+
+    # Regroupe les requêtes en attente en lots de max_batch au plus, sans attendre plus de max_wait
+    # après la première ; les FEN répétées dans un lot ne sont évaluées qu'une fois
+    async def batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            pending = {}
+            for fen_string, future in batch:
+                pending.setdefault(fen_string, []).append(future)
+            try:
+                results = await loop.run_in_executor(self.executor, self.score, list(pending))
+            except Exception as error:
+                for futures in pending.values():
+                    for future in futures:
+                        future.set_exception(error)
+                continue
+            self.batches += 1
+            self.scored += len(pending)
+            if len(self.cache) + len(results) > self.cache_size:
+                self.cache.clear()
+            self.cache.update(results)
+            for fen_string, futures in pending.items():
+                for future in futures:
+                    future.set_result(results[fen_string])
+
+    # Réponse pour une FEN, depuis le cache ou le prochain lot
+    async def evaluate(self, fen_string):
+        start = time.perf_counter()
+        self.requests += 1
+        result = self.cache.get(fen_string)
+        if result is None:
+            future = asyncio.get_running_loop().create_future()
+            await self.queue.put((fen_string, future))
+            result = await future
+        else:
+            self.cache_hits += 1
+        self.latencies.append(time.perf_counter() - start)
+        return result
+
+    # Métriques : requêtes par seconde depuis le démarrage, taux de succès du cache, taille moyenne
+    # des lots et latences p50/p99 des dernières requêtes
+    def stats(self):
+        elapsed = time.perf_counter() - self.start
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        return {
+            "requests": self.requests,
+            "requests_per_sec": self.requests / elapsed if elapsed else 0.0,
+            "cache_hits": self.cache_hits,
+            "hit_rate": self.cache_hits / self.requests if self.requests else 0.0,
+            "batches": self.batches,
+            "mean_batch": self.scored / self.batches if self.batches else 0.0,
+            "p50_ms": float(np.percentile(latencies, 50)) * 1e3,
+            "p99_ms": float(np.percentile(latencies, 99)) * 1e3,
+        }
+
+    async def answer(self, line, writer):
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            request = None
+        if not isinstance(request, dict):
+            response = {"error": "Requête invalide. Utilisez un objet JSON par ligne."}
+        elif request.get("stats"):
+            response = self.stats()
+        elif not isinstance(request.get("fen"), str):
+            response = {"error": "Requête invalide. Utilisez {\"fen\": \"...\"}."}
+        else:
+            try:
+                response = dict(await self.evaluate(request["fen"]))
+            except Exception as error:  # Chaque requête reçoit une réponse, même si son lot a échoué
+                response = {"fen": request["fen"], "error": f"Évaluation impossible : {error}"}
+            if not request.get("q_values"):
+                response.pop("q_values", None)
+        if isinstance(request, dict) and "id" in request:
+            response["id"] = request["id"]
+        writer.write((json.dumps(response) + "\n").encode())
+        await writer.drain()
+
+    # Une connexion peut envoyer plusieurs requêtes sans attendre les réponses : chacune est traitée
+    # dans sa propre tâche pour rejoindre le lot en cours
+    async def handle_connection(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self.answer(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def report(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            stats = self.stats()
+            print(f"{stats['requests']} requêtes ({stats['requests_per_sec']:.0f}/s), cache {stats['hit_rate']:.1%}, "
+                  f"lots de {stats['mean_batch']:.1f}, p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms",
+                  flush=True)
+
+    # Sert sur un socket Unix (socket_path) ou en TCP local
+    async def serve(self, socket_path=None, host="127.0.0.1", port=DEFAULT_PORT, report_every=None):
+        tasks = [asyncio.create_task(self.batcher())]
+        if report_every:
+            tasks.append(asyncio.create_task(self.report(report_every)))
+        if socket_path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.executor.shutdown()
+
+
+# Client bloquant minimal : envoie toutes les FEN sur une connexion puis retourne les réponses
+# dans l'ordre des FEN
+def query(fens, socket_path=None, host="127.0.0.1", port=DEFAULT_PORT, q_values=False):
+    if socket_path is not None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(socket_path)
+    else:
+        connection = socket.create_connection((host, port))
+    with connection, connection.makefile("rwb") as stream:
+        for index, fen_string in enumerate(fens):
+            stream.write((json.dumps({"id": index, "fen": fen_string, "q_values": q_values}) + "\n").encode())
+        stream.flush()
+        responses = [json.loads(stream.readline()) for _ in fens]
+    return sorted(responses, key=lambda response: response["id"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Service local de meilleur coup pour un agent entraîné")
+    parser.add_argument("--agent", choices=list(AGENT_CLASSES), default="q_learning")
+    parser.add_argument("--config", default="{}", help="paramètres JSON du constructeur de l'agent")
+    parser.add_argument("--checkpoint", help="sauvegarde de l'agent (voir checkpoint.py)")
+    parser.add_argument("--socket", help="chemin d'un socket Unix (sinon TCP sur --host:--port)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch", type=int, default=64, help="positions évaluées au plus par lot")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="attente maximale pour compléter un lot")
+    parser.add_argument("--cache-size", type=int, default=100000, help="réponses gardées en cache")
+    parser.add_argument("--report-every", type=float, help="afficher les métriques toutes les N secondes")
+    args = parser.parse_args(argv)
+
+    agent = load_agent(args.agent, json.loads(args.config), args.checkpoint)
+    server = InferenceServer(agent, args.max_batch, args.max_wait_ms / 1e3, args.cache_size)
+    try:
+        asyncio.run(server.serve(args.socket, args.host, args.port, args.report_every))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+# Instrumentation optionnelle des boucles d'entraînement et d'évaluation. Pour l'activer :
+#     default_engine.instrumentation = Instrumentation(report_every=100)
+# Désactivée (None, par défaut), elle ne coûte qu'un test par épisode dans le moteur d'épisodes.
+
+# Méthodes chronométrées et phase correspondante
+TRAIN_AGENT_PHASES = {"choose_action": "train.choose_action", "get_best_move": "train.best_move",
+                      "state_key": "train.state_key", "update_q": "train.update_q"}
+TRAIN_CACHE_PHASES = {"legal_moves": "train.move_generation", "is_game_over": "train.game_over"}
+EVAL_AGENT_PHASES = {"get_best_move": "eval.best_move", "get_best_moves": "eval.best_move"}
+EVAL_BOARD_PHASES = {"get_possible_moves": "eval.move_generation", "get_fen": "eval.fen",
+                     "apply_move": "eval.push", "is_check_mate": "eval.game_over", "is_game_over": "eval.game_over",
+                     "play_random_move": "eval.opponent"}
+EVAL_ENV_PHASES = {"legal_moves": "eval.move_generation", "step": "eval.step"}
+
+
+# Enveloppe qui chronomètre certaines méthodes d'un objet ; les autres attributs, en lecture comme
+# en écriture (epsilon décrémenté par le moteur), sont ceux de l'objet enveloppé
+class TimedProxy:
+    def __init__(self, target, instrumentation, phases):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_instrumentation", instrumentation)
+        object.__setattr__(self, "_phases", phases)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        phase = self._phases.get(name)
+        if phase is None:
+            return attribute
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                self._instrumentation.add(phase, time.perf_counter() - start)
+        return timed
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+
+# Profileur par échantillonnage : un thread relève la pile du thread observé toutes les interval secondes
+class SamplingProfiler:
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.own = Counter()  # Fonction en cours d'exécution -> échantillons
+        self.cumulative = Counter()  # Fonction présente dans la pile -> échantillons
+        self.samples = 0
+        self.running = False
+        self.thread = None
+
+    def enable(self):
+        self.thread_id = threading.get_ident()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def disable(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        while self.running:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples += 1
+                self.own[self.describe(frame)] += 1
+                seen = set()
+                while frame is not None:
+                    name = self.describe(frame)
+                    if name not in seen:
+                        self.cumulative[name] += 1
+                        seen.add(name)
+                    frame = frame.f_back
+            time.sleep(self.interval)
+
+    @staticmethod
+    def describe(frame):
+        code = frame.f_code
+        return f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno}({code.co_name})"
+
+    def report(self, limit=20):
+        lines = [f"{self.samples} échantillons", f"{'propre':>8} {'cumulé':>8}  fonction"]
+        for name, count in self.own.most_common(limit):
+            lines.append(f"{count / self.samples:>8.1%} {self.cumulative[name] / self.samples:>8.1%}  {name}")
+        return "\n".join(lines)
+
+
+class Instrumentation:
+    # report_every : résumé tous les report_every épisodes, passé à callback (affiché par défaut)
+    # profile_episodes : (premier, dernier) épisodes profilés, avec profiler="cprofile" ou "sampling"
+    # profile_file : fichier où enregistrer les statistiques cProfile (sinon elles sont affichées)
+    def __init__(self, report_every=None, callback=None, profile_episodes=None, profiler="cprofile",
+                 profile_file=None):
+        if profiler not in ("cprofile", "sampling"):
+            raise ValueError("Profileur invalide. Utilisez 'cprofile' ou 'sampling'.")
+        self.report_every = report_every
+        self.callback = callback or print_summary
+        self.profile_episodes = profile_episodes
+        self.profiler_type = profiler
+        self.profile_file = profile_file
+        self.profiler = None
+        self.times = defaultdict(float)  # Phase -> secondes cumulées
+        self.counts = defaultdict(int)  # Phase -> nombre d'appels
+        self.episodes = 0
+        self.training_time = 0.0  # Durée totale des épisodes d'entraînement
+        self.episode_start = None
+        self.start = time.perf_counter()
+        self.agent = None  # Dernier agent et cache observés, pour la taille de la table Q et les succès du cache
+        self.cache = None
+        self.previous_instrumentation = None  # Instrumentation de l'agent avant wrap_training
+
+    def add(self, phase, seconds):
+        self.times[phase] += seconds
+        self.counts[phase] += 1
+
+    # Enveloppes chronométrées de l'agent et du cache pour le moteur d'épisodes ; l'agent est rattaché
+    # à cette instrumentation jusqu'à unwrap_training, appelé à la fin de l'entraînement
+    def wrap_training(self, agent, cache):
+        self.agent, self.cache = agent, cache
+        if hasattr(agent, "instrumentation"):
+            self.previous_instrumentation = agent.instrumentation
+            agent.instrumentation = self  # Temps de réajustement du modèle (agent approximatif)
+        return TimedProxy(agent, self, TRAIN_AGENT_PHASES), TimedProxy(cache, self, TRAIN_CACHE_PHASES)
+
+    # Rend à l'agent son instrumentation d'avant wrap_training : les réajustements hors de cet
+    # entraînement ne sont plus chronométrés ici
+    def unwrap_training(self):
+        if hasattr(self.agent, "instrumentation"):
+            self.agent.instrumentation = self.previous_instrumentation
+        self.previous_instrumentation = None
+
+    # Enveloppes chronométrées de l'agent et du plateau pour une partie d'évaluation
+    def wrap_evaluation(self, agent, chess_board):
+        return TimedProxy(agent, self, EVAL_AGENT_PHASES), TimedProxy(chess_board, self, EVAL_BOARD_PHASES)
+
+    # Enveloppes chronométrées de l'agent et de l'environnement vectorisé pour evaluate_vectorized
+    def wrap_vector_evaluation(self, agent, env):
+        return TimedProxy(agent, self, EVAL_AGENT_PHASES), TimedProxy(env, self, EVAL_ENV_PHASES)
+
+    def episode_started(self):
+        if self.profile_episodes is not None and self.episodes == self.profile_episodes[0]:
+            self.profiler = cProfile.Profile() if self.profiler_type == "cprofile" else SamplingProfiler()
+            self.profiler.enable()
+        self.episode_start = time.perf_counter()
+
+    def episode_finished(self):
+        self.training_time += time.perf_counter() - self.episode_start
+        self.episodes += 1
+        if self.profiler is not None and self.episodes > self.profile_episodes[1]:
+            self.profiler.disable()
+            self.report_profile()
+            self.profiler = None
+        if self.report_every and self.episodes % self.report_every == 0:
+            self.callback(self.summary())
+
+    def report_profile(self):
+        if isinstance(self.profiler, SamplingProfiler):
+            print(self.profiler.report())
+        elif self.profile_file is not None:
+            self.profiler.dump_stats(self.profile_file)
+        else:
+            stream = io.StringIO()
+            pstats.Stats(self.profiler, stream=stream).sort_stats("cumulative").print_stats(20)
+            print(stream.getvalue())
+
+    # Résumé : épisodes, demi-coups, débit, temps par phase, taille de la table Q et succès du cache
+    def summary(self):
+        plies = self.counts["train.choose_action"]
+        measured = sum(seconds for phase, seconds in self.times.items() if phase.startswith("train.")
+                       and phase != "train.refit")
+        summary = {
+            "episodes": self.episodes,
+            "plies": plies,
+            "updates": self.counts["train.update_q"],
+            "plies_per_sec": plies / self.training_time if self.training_time else 0.0,
+            "elapsed": time.perf_counter() - self.start,
+            "phases": dict(self.times),
+            "calls": dict(self.counts),
+            # Temps d'entraînement hors phases mesurées : board.push, répétitions, boucle elle-même
+            "train.other": max(0.0, self.training_time - measured),
+        }
+        if self.agent is not None:
+            if hasattr(self.agent, "Q"):
+                summary["q_table_size"] = len(self.agent.Q)
+            elif hasattr(self.agent, "X"):
+                summary["training_samples"] = len(self.agent.X)
+        if self.cache is not None and hasattr(self.cache, "stats"):
+            summary["cache"] = self.cache.stats()
+        return summary
+
+
+# Affichage par défaut d'un résumé
+def print_summary(summary):
+    line = f"{summary['episodes']} épisodes, {summary['plies']} demi-coups ({summary['plies_per_sec']:.0f}/s)"
+    if "q_table_size" in summary:
+        line += f", table Q : {summary['q_table_size']} états"
+    if "cache" in summary:
+        line += f", cache : {summary['cache']['hit_rate']:.1%} de succès"
+    print(line)
+    phases = dict(summary["phases"], **{"train.other": summary["train.other"]})
+    total = sum(phases.values())
+    for phase, seconds in sorted(phases.items(), key=lambda item: -item[1]):
+        print(f"  {phase:<24} {seconds:8.3f} s {seconds / total if total else 0:6.1%} "
+              f"{summary['calls'].get(phase, 0):>9} appels")
@@ -0,0 +1,102 @@
+import heapq
+import itertools
+import random
+
+# Modes de planification disponibles :
+# - "dyna" : Dyna-Q, les mises à jour simulées portent sur des transitions observées tirées au hasard
+# - "sweeping" : balayage prioritaire, les transitions dont l'erreur TD est la plus grande passent en
+#   premier et la mise à jour d'un état remet ses prédécesseurs dans la file
+PLANNING_MODES = ("dyna", "sweeping")
+
+
+# Modèle déterministe des transitions observées (état, coup) -> (récompense, état suivant), utilisé
+# pour des mises à jour simulées de la table Q qui ne demandent aucune génération de coups.
+# La valeur d'un état suivant est le maximum de Q sur ses propres coups, enregistrés lorsqu'il a
+# lui-même été joué ; un état suivant jamais joué (mat, pat ou pas encore visité) vaut 0.
+class PlanningModel:
+    def __init__(self, q_table, alpha, gamma, mode="sweeping", threshold=1e-3):
+        if mode not in PLANNING_MODES:
+            raise ValueError("Planification invalide. Utilisez 'dyna' ou 'sweeping'.")
+        self.q_table = q_table  # Table Q partagée avec l'agent (DictQTable ou DenseQTable)
+        self.alpha = alpha
+        self.gamma = gamma
+        self.mode = mode
+        self.threshold = threshold  # Erreur TD minimale pour entrer dans la file de priorité
+        # (id d'état, id de coup) -> (état, coup, récompense, id de l'état suivant) ; les ids sont ceux
+        # de la table Q, communs aux positions symétriques, l'état et le coup ceux du dernier passage
+        self.transitions = {}
+        self.keys = []  # Transitions observées, pour le tirage uniforme de Dyna-Q
+        self.actions = {}  # id d'état -> (état, coups légaux)
+        self.predecessors = {}  # id d'état -> {transition menant à cet état: None}, dans l'ordre d'ajout
+        self.queue = []  # Tas de (-priorité, ordre d'insertion, transition)
+        self.priorities = {}  # Priorité courante des transitions présentes dans la file
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.transitions)
+
+    # Enregistre une transition réelle, puis effectue steps mises à jour simulées
+    def observe(self, state, action, reward, next_state, possible_actions, steps):
+        key = self.q_table.transition_id(state, action)
+        next_id = self.q_table.state_id(next_state)
+        if key is None or next_id is None:
+            return
+        state_id = key[0]
+        if key not in self.transitions:
+            self.keys.append(key)
+        self.transitions[key] = (state, action, reward, next_id)
+        self.actions[state_id] = (state, possible_actions)
+        self.predecessors.setdefault(next_id, {})[key] = None
+
+        if self.mode == "dyna":
+            for _ in range(steps):
+                self.backup(random.choice(self.keys))
+            return
+
+        # Q(state, ·) vient de changer : la transition et celles qui mènent à state sont à revoir
+        self.push(key)
+        self.push_predecessors(state_id)
+        for _ in range(steps):
+            key = self.pop()
+            if key is None:
+                break
+            self.backup(key)
+            self.push_predecessors(key[0])
+
+    # Valeur d'un état suivant d'après ses coups enregistrés
+    def value(self, state_id):
+        entry = self.actions.get(state_id)
+        if entry is None:
+            return 0.0
+        return max(self.q_table.q_values(*entry))
+
+    # Cible r + gamma * max Q(s', a') d'une transition enregistrée
+    def target(self, key):
+        _, _, reward, next_id = self.transitions[key]
+        return reward + self.gamma * self.value(next_id)
+
+    # Mise à jour simulée de la table Q pour une transition enregistrée
+    def backup(self, key):
+        state, action = self.transitions[key][:2]
+        self.q_table.update(state, action, self.target(key), self.alpha)
+
+    # Ajoute une transition à la file si son erreur TD dépasse le seuil (et sa priorité actuelle)
+    def push(self, key):
+        state, action = self.transitions[key][:2]
+        priority = abs(self.target(key) - self.q_table.get(state, action))
+        if priority > self.threshold and priority > self.priorities.get(key, 0.0):
+            self.priorities[key] = priority
+            heapq.heappush(self.queue, (-priority, next(self.counter), key))
+
+    def push_predecessors(self, state_id):
+        for key in self.predecessors.get(state_id, ()):
+            self.push(key)
+
+    # Retire la transition de plus forte priorité, en ignorant les entrées périmées du tas
+    def pop(self):
+        while self.queue:
+            priority, _, key = heapq.heappop(self.queue)
+            if self.priorities.get(key) == -priority:
+                del self.priorities[key]
+                return key
+        return None
@@ -0,0 +1,145 @@
+import itertools
+import chess
+import numpy as np
+from q_table import KING_TRIANGLE
+from state_encoding import SQUARE_SYMMETRIES
+
+# Au-delà de ce nombre de placements à analyser, l'énumération serait trop longue
+MAX_PLACEMENTS = 2 ** 20
+
+
+# Construit la FEN (blancs au trait) d'un placement : squares[i] est la case de la pièce pieces[i]
+def placement_fen(squares, symbols):
+    board = [""] * 64
+    for square, symbol in zip(squares, symbols):
+        board[square] = symbol
+    rows = []
+    for rank in range(7, -1, -1):
+        row, empty = "", 0
+        for symbol in board[rank * 8:rank * 8 + 8]:
+            if symbol:
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += symbol
+            else:
+                empty += 1
+        rows.append(row + (str(empty) if empty else ""))
+    return "/".join(rows) + " w - - 0 1"
+
+
+# Vrai si un coup blanc met mat ; seuls les coups qui donnent échec sont joués (push/pop, sans copie)
+def has_mate_in_one(board):
+    for move in board.legal_moves:
+        if board.gives_check(move):
+            board.push(move)
+            mate = board.is_checkmate()
+            board.pop()
+            if mate:
+                return True
+    return False
+
+
+# Index de tous les placements valides d'un matériel, blancs au trait, construit une seule fois
+# - placements : tableau [positions, pièces] des cases de chaque pièce, dans l'ordre de allowed_pieces
+# - mate_in_one : positions où les blancs matent en un coup
+# - playable : positions où la partie n'est pas déjà terminée (mode "random" du générateur)
+class PositionIndex:
+    def __init__(self, allowed_pieces, placements=None, mate_in_one=None, playable=None):
+        self.allowed_pieces = list(allowed_pieces)
+        self.symbols = [chess.Piece(piece_type, color).symbol() for piece_type, color in self.allowed_pieces]
+        if placements is None:
+            placements, mate_in_one, playable = self.enumerate()
+        self.placements = placements
+        self.mate_in_one = mate_in_one
+        self.playable = playable
+
+    def __len__(self):
+        return len(self.placements)
+
+    # Groupes de pièces identiques : leurs cases sont gardées triées pour ne compter chaque position qu'une fois
+    def identical_groups(self):
+        groups = {}
+        for index, piece in enumerate(self.allowed_pieces):
+            groups.setdefault(piece, []).append(index)
+        return [indices for indices in groups.values() if len(indices) > 1]
+
+    # Cases possibles de chaque pièce ; sans pions, le roi blanc est limité au triangle a1-d1-d4
+    @staticmethod
+    def square_choices(allowed_pieces):
+        symmetric = all(piece_type != chess.PAWN for piece_type, _ in allowed_pieces)
+        white_king = list(allowed_pieces).index((chess.KING, chess.WHITE))
+        return [KING_TRIANGLE if symmetric and index == white_king else chess.SQUARES
+                for index in range(len(allowed_pieces))]
+
+    # Vrai si le matériel est assez petit pour que tous ses placements soient énumérés
+    @staticmethod
+    def can_index(allowed_pieces):
+        return int(np.prod([len(squares) for squares in PositionIndex.square_choices(allowed_pieces)])) <= MAX_PLACEMENTS
+
+    # Énumère les placements ; sans pions, seul le roi blanc dans le triangle a1-d1-d4 est analysé,
+    # les autres positions s'en déduisent par les 8 symétries du plateau
+    def enumerate(self):
+        if not self.can_index(self.allowed_pieces):
+            raise ValueError("Trop de placements à énumérer pour ce matériel.")
+        symmetric = all(piece_type != chess.PAWN for piece_type, _ in self.allowed_pieces)
+        square_choices = self.square_choices(self.allowed_pieces)
+
+        groups = self.identical_groups()
+        pieces = [chess.Piece(piece_type, color) for piece_type, color in self.allowed_pieces]
+        board = chess.Board(None)
+        placements, mate_in_one, playable = [], [], []
+
+        for squares in itertools.product(*square_choices):
+            if len(set(squares)) != len(squares):
+                continue
+            if any(list(squares[i] for i in group) != sorted(squares[i] for i in group) for group in groups):
+                continue
+            board.set_piece_map(dict(zip(squares, pieces)))
+            board.turn = chess.WHITE
+            if not board.is_valid():
+                continue
+            placements.append(squares)
+            over = board.is_game_over()
+            playable.append(not over)
+            mate_in_one.append(not over and has_mate_in_one(board))
+
+        placements = np.array(placements, dtype=np.uint8).reshape(-1, len(pieces))
+        mate_in_one = np.array(mate_in_one, dtype=bool)
+        playable = np.array(playable, dtype=bool)
+        if symmetric:
+            placements, mate_in_one, playable = self.expand_symmetries(placements, mate_in_one, playable, groups)
+        return placements, mate_in_one, playable
+
+    # Ajoute les images des positions par les 8 symétries et retire les doublons
+    def expand_symmetries(self, placements, mate_in_one, playable, groups):
+        tables = np.array(SQUARE_SYMMETRIES, dtype=np.uint8)
+        images = np.concatenate([table[placements] for table in tables])
+        for group in groups:
+            images[:, group] = np.sort(images[:, group], axis=1)
+        images, first = np.unique(images, axis=0, return_index=True)
+        return images, np.tile(mate_in_one, len(tables))[first], np.tile(playable, len(tables))[first]
+
+    # Tire k positions en temps constant par position ; unique=True tire sans remise
+    def sample(self, k, mode="mate_in_one", seed=None, unique=False):
+        if mode == "mate_in_one":
+            pool = np.flatnonzero(self.mate_in_one)
+        elif mode == "random":
+            pool = np.flatnonzero(self.playable)
+        else:
+            raise ValueError("Mode invalide. Utilisez 'mate_in_one' ou 'random'.")
+        if unique and k > len(pool):
+            raise ValueError(f"Seulement {len(pool)} positions distinctes disponibles pour ce mode.")
+
+        rng = np.random.default_rng(seed)
+        chosen = pool[rng.choice(len(pool), size=k, replace=not unique)]
+        return [placement_fen(squares, self.symbols) for squares in self.placements[chosen].tolist()]
+
+    # Sauvegarde et rechargement de l'index, pour ne l'énumérer qu'une fois
+    def save(self, file_name):
+        np.savez_compressed(file_name, placements=self.placements, mate_in_one=self.mate_in_one, playable=self.playable)
+
+    @classmethod
+    def load(cls, file_name, allowed_pieces):
+        data = np.load(file_name)
+        return cls(allowed_pieces, data["placements"], data["mate_in_one"], data["playable"])
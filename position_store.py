@@ -0,0 +1,139 @@
+import struct
+import numpy as np
+from chess_board_loader import material_signature, open_positions, parse_position
+from position_index import placement_fen
+
+# Extension des bases de positions binaires
+STORE_EXTENSION = ".pos"
+MAGIC = b"CHESSPOS"
+VERSION = 1
+# En-tête de 64 octets : signature, version, nombre de pièces, présence d'un label, nombre de
+# positions et matériel (lettres des pièces triées, comme chess_board_loader.material_signature)
+HEADER = struct.Struct("<8sHBBQ32s12x")
+CHUNK_SIZE = 100000  # Positions converties par bloc lors des conversions
+
+
+# Type d'un enregistrement : une case par pièce (dans l'ordre du matériel, cases croissantes pour
+# des pièces identiques), le trait, puis éventuellement un label (distance au mat)
+def record_dtype(nb_pieces, label=False):
+    fields = [("squares", np.uint8, (nb_pieces,)), ("turn", np.uint8)]
+    if label:
+        fields.append(("label", "<i2"))
+    return np.dtype(fields)
+
+
+# Cases des pièces d'une FEN dans l'ordre du matériel symbols, lues directement dans le placement
+def fen_squares(fen_string, symbols):
+    squares_by_symbol = {}
+    rank, file = 7, 0
+    for symbol in fen_string.split(" ", 1)[0]:
+        if symbol == "/":
+            rank, file = rank - 1, 0
+        elif symbol.isdigit():
+            file += int(symbol)
+        else:
+            squares_by_symbol.setdefault(symbol, []).append(rank * 8 + file)
+            file += 1
+    for squares in squares_by_symbol.values():
+        squares.sort()
+    return [squares_by_symbol[symbol].pop(0) for symbol in symbols]
+
+
+# FEN d'un enregistrement (sans roque ni prise en passant, compteurs « 0 1 »)
+def record_fen(squares, turn, symbols):
+    return placement_fen(squares, symbols).split(" ", 1)[0] + (" w" if turn else " b") + " - - 0 1"
+
+
+# Base de positions binaire ouverte en lecture avec numpy.memmap : rien n'est lu avant l'accès
+# à une position, et les tableaux squares, turns et labels sont des vues sans copie du fichier
+class PositionStore:
+    def __init__(self, file_name):
+        with open(file_name, "rb") as file:
+            magic, version, nb_pieces, label, count, symbols = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{file_name} n'est pas une base de positions (version {VERSION}).")
+        self.symbols = symbols.rstrip(b"\0").decode()
+        dtype = record_dtype(nb_pieces, bool(label))
+        if count:
+            self.records = np.memmap(file_name, dtype=dtype, mode="r", offset=HEADER.size, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=dtype)  # numpy.memmap refuse un fichier sans données
+        self.squares = self.records["squares"]
+        self.turns = self.records["turn"]
+        self.labels = self.records["label"] if label else None
+
+    def __len__(self):
+        return len(self.records)
+
+    def fen(self, index):
+        return record_fen(self.squares[index].tolist(), self.turns[index], self.symbols)
+
+    def fens(self):
+        for index in range(len(self)):
+            yield self.fen(index)
+
+    # Tire k positions en temps constant par position ; unique=True tire sans remise
+    def sample(self, k, seed=None, unique=False):
+        rng = np.random.default_rng(seed)
+        indices = rng.choice(len(self), size=k, replace=not unique)
+        return [self.fen(index) for index in indices]
+
+
+# Écrit une base binaire à partir d'un itérable de (FEN, label ou None), bloc par bloc
+# Toutes les positions doivent avoir le même matériel, sans roque ni prise en passant
+def write_store(file_name, positions, label=False):
+    symbols = None
+    count = 0
+    with open(file_name, "wb") as file:
+        file.write(bytes(HEADER.size))  # En-tête réécrit à la fin, quand le nombre de positions est connu
+        chunk = []
+        for fen_string, value in positions:
+            fields = fen_string.split()
+            if symbols is None:
+                symbols = material_signature(fen_string)
+                dtype = record_dtype(len(symbols), label)
+            elif material_signature(fen_string) != symbols:
+                raise ValueError(f"Matériel différent de {symbols} : {fen_string}")
+            if fields[2:4] != ["-", "-"]:
+                raise ValueError(f"Roque et prise en passant non représentables : {fen_string}")
+            record = (fen_squares(fen_string, symbols), fields[1] == "w")
+            chunk.append(record + (value if value is not None else -1,) if label else record)
+            if len(chunk) >= CHUNK_SIZE:
+                np.array(chunk, dtype=dtype).tofile(file)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            np.array(chunk, dtype=dtype).tofile(file)
+            count += len(chunk)
+
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, len(symbols or ""), label, count, (symbols or "").encode()))
+
+
+# Label d'une ligne de fichier texte (« ; dtm N »), ou None
+def parse_label(line):
+    _, _, comment = line.partition(";")
+    fields = comment.split()
+    return int(fields[1]) if len(fields) >= 2 and fields[0] == "dtm" else None
+
+
+# Convertit un fichier texte (FEN ou EPD, éventuellement compressé) en base binaire ;
+# label=True garde la distance au mat « ; dtm N » des lignes (-1 si absente)
+def txt_to_store(txt_file, store_file, label=False):
+    def positions():
+        with open_positions(txt_file) as file:
+            for line in file:
+                fen_string = parse_position(line)
+                if fen_string is not None:
+                    yield fen_string, parse_label(line)
+    write_store(store_file, positions(), label)
+
+
+# Convertit une base binaire en fichier texte, avec « ; dtm N » si elle a des labels
+def store_to_txt(store_file, txt_file):
+    store = PositionStore(store_file)
+    with open(txt_file, "w") as file:
+        for index, fen_string in enumerate(store.fens()):
+            if store.labels is not None:
+                fen_string += f" ; dtm {store.labels[index]}"
+            file.write(fen_string + "\n")
@@ -0,0 +1,469 @@
+import copy
+import heapq
+import itertools
+import sys
+from collections import OrderedDict
+import chess
+import numpy as np
+from state_encoding import PIECE_ORDER, SQUARE_SYMMETRIES, StateEncoder, canonical_transform, is_symmetric_material
+
+# Cases du triangle a1-d1-d4 : avec les symétries, le roi blanc canonique s'y trouve toujours
+KING_TRIANGLE = (chess.A1, chess.B1, chess.C1, chess.D1, chess.B2, chess.C2, chess.D2, chess.C3, chess.D3, chess.D4)
+TRIANGLE_INDEX = {square: index for index, square in enumerate(KING_TRIANGLE)}
+# Politiques d'éviction de la table Q bornée
+EVICTIONS = ("lru", "lfu")
+
+
+# Signature matérielle d'un plateau : nombre de pièces de chaque type, dans l'ordre de PIECE_ORDER
+def material_signature(board):
+    return tuple(chess.popcount(board.pieces_mask(piece_type, color)) for color, piece_type in PIECE_ORDER)
+
+
+# Clés d'état en tableau pour une sauvegarde (voir checkpoint.py) : FEN en octets ASCII, entiers
+# (encodages "packed" et "zobrist", parfois plus grands que 64 bits) en octets petit-boutistes
+def pack_keys(keys):
+    if any(isinstance(key, str) for key in keys):
+        return np.array([key.encode() for key in keys], dtype=bytes), "fen"
+    size = max([(key.bit_length() + 7) // 8 for key in keys] + [1])
+    data = b"".join(key.to_bytes(size, "little") for key in keys)
+    return np.frombuffer(data, dtype=np.uint8).reshape(len(keys), size), "int"
+
+
+def unpack_keys(array, kind):
+    if kind == "fen":
+        return [key.decode() for key in array.tolist()]
+    return [int.from_bytes(row.tobytes(), "little") for row in array]
+
+
+# Code d'un coup sur 16 bits, comme StateEncoder.encode_move : départ * 64 + arrivée (+ promotion * 4096)
+def move_code(move):
+    return ((move.promotion or 0) << 12) | (move.from_square << 6) | move.to_square
+
+
+def code_move(code):
+    return chess.Move((code >> 6) & 63, code & 63, (code >> 12) or None)
+
+
+# Table Q d'origine : dictionnaire de dictionnaires, état -> coup -> valeur
+class DictQTable:
+    def __init__(self, encoder=None):
+        self.encoder = encoder or StateEncoder()  # Encodage des états et des coups
+        self.table = {}  # clé d'état -> {clé de coup: valeur}
+
+    def __len__(self):
+        return len(self.table)
+
+    # Clé (état, symétrie) d'un plateau, réutilisable à la place de l'état
+    def key(self, board):
+        return self.encoder.encode(board)
+
+    # Identifiant hachable d'un état, commun à toutes ses représentations (FEN, plateau, clé) et à
+    # toutes ses positions symétriques : la clé canonique seule
+    def state_id(self, state):
+        return self.encoder.encode(state)[0]
+
+    # Identifiants de l'état et du coup dans le repère canonique, comme dans q_values
+    def transition_id(self, state, action):
+        key, transform = self.encoder.encode(state)
+        return key, self.encoder.encode_move(action, transform)
+
+    # Valeurs Q de toutes les actions d'un état ; init=True crée l'entrée de l'état s'il est inconnu
+    def q_values(self, state, actions, init=False):
+        key, transform = self.encoder.encode(state)
+        action_keys = [self.encoder.encode_move(action, transform) for action in actions]
+        if init and key not in self.table:
+            self.table[key] = {action_key: 0 for action_key in action_keys}
+        q_state = self.table.get(key, {})
+        return [q_state.get(action_key, 0) for action_key in action_keys]
+
+    def get(self, state, action):
+        key, transform = self.encoder.encode(state)
+        return self.table.get(key, {}).get(self.encoder.encode_move(action, transform), 0)
+
+    # Rapproche Q(state, action) de target avec un taux d'apprentissage alpha
+    def update(self, state, action, target, alpha):
+        key, transform = self.encoder.encode(state)
+        action_key = self.encoder.encode_move(action, transform)
+        q_state = self.table.setdefault(key, {})
+        current_q = q_state.get(action_key, 0)
+        q_state[action_key] = current_q + alpha * (target - current_q)
+
+    # Copie des valeurs apprises, publiable vers un autre processus (voir async_training.py) : la
+    # table continue d'être modifiée pendant que la file l'envoie
+    def snapshot(self):
+        return copy.deepcopy(self.table)
+
+    def load_snapshot(self, snapshot):
+        self.table = snapshot
+
+    # Contenu de la table en tableaux NumPy pour une sauvegarde sur disque : clés des états, nombre
+    # de coups par état, puis coups et valeurs de tous les états à la suite, dans l'ordre de la table
+    def checkpoint_state(self):
+        keys, kind = pack_keys(list(self.table))
+        moves = self.encoder.method == "fen"  # Coups gardés comme chess.Move
+        arrays = {
+            "keys": keys,
+            "sizes": np.array([len(q_state) for q_state in self.table.values()], dtype=np.int64),
+            "actions": np.array([move_code(action) if moves else action
+                                 for q_state in self.table.values() for action in q_state], dtype=np.uint16),
+            "values": np.array([value for q_state in self.table.values() for value in q_state.values()],
+                               dtype=np.float64),
+        }
+        return arrays, {"key_kind": kind}
+
+    def load_checkpoint_state(self, arrays, meta):
+        keys = unpack_keys(arrays["keys"], meta["key_kind"])
+        actions = arrays["actions"].tolist()
+        if self.encoder.method == "fen":
+            moves = {code: code_move(code) for code in set(actions)}  # Un chess.Move par coup distinct
+            actions = [moves[code] for code in actions]
+        values = arrays["values"].tolist()
+        bounds = [0] + np.cumsum(arrays["sizes"]).tolist()
+        self.table = {key: dict(zip(actions[start:end], values[start:end]))
+                      for key, start, end in zip(keys, bounds, bounds[1:])}
+
+
+# Table Q bornée : dictionnaire de dictionnaires limité en nombre d'états et/ou en octets estimés
+# - eviction="lru" évince l'état le moins récemment utilisé, "lfu" le moins souvent utilisé
+# - un état dont la meilleure valeur atteint protect_value (un mat y a été appris) est épargné tant
+#   qu'un autre état parmi les candidats examinés peut être évincé
+class BoundedQTable(DictQTable):
+    def __init__(self, encoder=None, max_entries=100000, max_bytes=None, eviction="lru", protect_value=50.0,
+                 scan=32):
+        if eviction not in EVICTIONS:
+            raise ValueError("Éviction invalide. Utilisez 'lru' ou 'lfu'.")
+        super().__init__(encoder)
+        self.max_entries = max_entries  # Nombre maximal d'états (None : pas de limite)
+        self.max_bytes = max_bytes  # Taille maximale estimée en octets (None : pas de limite)
+        self.eviction = eviction
+        self.protect_value = protect_value
+        self.scan = scan  # Nombre maximal de candidats examinés par éviction
+        self.table = OrderedDict()  # Ordre d'utilisation pour LRU, du plus ancien au plus récent
+        self.visits = {}  # clé d'état -> nombre d'accès
+        self.heap = []  # Tas de (accès, ordre, clé) pour LFU, les entrées périmées sont ignorées
+        self.counter = itertools.count()
+        self.entry_bytes = {}  # clé d'état -> taille estimée
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Taille estimée d'une entrée : clé (FEN ou entier), dictionnaire des coups et valeurs (les coups
+    # eux-mêmes sont partagés avec le cache de transpositions)
+    def estimate_bytes(self, key, q_state):
+        return sys.getsizeof(key) + sys.getsizeof(q_state) + len(q_state) * sys.getsizeof(0.0)
+
+    def over_capacity(self):
+        return ((self.max_entries is not None and len(self.table) > self.max_entries)
+                or (self.max_bytes is not None and self.total_bytes > self.max_bytes))
+
+    # Enregistre un accès à un état présent
+    def touch(self, key):
+        self.visits[key] += 1
+        if self.eviction == "lru":
+            self.table.move_to_end(key)
+        else:
+            heapq.heappush(self.heap, (self.visits[key], next(self.counter), key))
+            if len(self.heap) > 4 * len(self.table) + 1000:
+                self.rebuild_heap()
+
+    def rebuild_heap(self):
+        self.heap = [(visits, next(self.counter), key) for key, visits in self.visits.items()]
+        heapq.heapify(self.heap)
+
+    # Ajoute un état puis évince d'autres états si la table dépasse sa capacité
+    def insert(self, key, q_state):
+        self.table[key] = q_state
+        self.visits[key] = 1
+        if self.eviction == "lfu":
+            heapq.heappush(self.heap, (1, next(self.counter), key))
+        self.entry_bytes[key] = self.estimate_bytes(key, q_state)
+        self.total_bytes += self.entry_bytes[key]
+        self.evict(key)
+        return q_state
+
+    def protected(self, key):
+        return max(self.table[key].values(), default=0) >= self.protect_value
+
+    # Évince jusqu'à revenir sous la capacité, sans jamais retirer l'état keep
+    def evict(self, keep):
+        while self.over_capacity():
+            victim = self.victim_lru(keep) if self.eviction == "lru" else self.victim_lfu(keep)
+            if victim is None:
+                return
+            del self.table[victim]
+            del self.visits[victim]
+            self.total_bytes -= self.entry_bytes.pop(victim)
+            self.evictions += 1
+
+    # Plus ancien état non protégé parmi les scan plus anciens ; les états protégés examinés
+    # repassent en fin de file, et à défaut le plus ancien est évincé
+    def victim_lru(self, keep):
+        candidates = [key for key in itertools.islice(self.table, self.scan + 1) if key != keep][:self.scan]
+        for key in candidates:
+            if not self.protected(key):
+                return key
+            self.table.move_to_end(key)
+        return candidates[0] if candidates else None
+
+    # État le moins utilisé non protégé parmi les scan moins utilisés, à défaut le moins utilisé
+    def victim_lfu(self, keep):
+        skipped = []
+        victim = None
+        while self.heap and len(skipped) < self.scan:
+            visits, order, key = heapq.heappop(self.heap)
+            if self.visits.get(key) != visits:
+                continue  # Entrée périmée
+            if key == keep or self.protected(key):
+                skipped.append((visits, order, key))
+                continue
+            victim = key
+            break
+        if victim is None:
+            candidates = [entry for entry in skipped if entry[2] != keep]
+            if candidates:
+                victim = candidates[0][2]
+                skipped.remove(candidates[0])
+        for entry in skipped:
+            heapq.heappush(self.heap, entry)
+        return victim
+
+    def q_values(self, state, actions, init=False):
+        key, transform = self.encoder.encode(state)
+        action_keys = [self.encoder.encode_move(action, transform) for action in actions]
+        q_state = self.table.get(key)
+        if q_state is None:
+            self.misses += 1
+            if not init:
+                return [0] * len(action_keys)
+            q_state = self.insert(key, {action_key: 0 for action_key in action_keys})
+        else:
+            self.hits += 1
+            self.touch(key)
+        return [q_state.get(action_key, 0) for action_key in action_keys]
+
+    def get(self, state, action):
+        key, transform = self.encoder.encode(state)
+        q_state = self.table.get(key)
+        if q_state is None:
+            self.misses += 1
+            return 0
+        self.hits += 1
+        self.touch(key)
+        return q_state.get(self.encoder.encode_move(action, transform), 0)
+
+    def update(self, state, action, target, alpha):
+        key, transform = self.encoder.encode(state)
+        action_key = self.encoder.encode_move(action, transform)
+        q_state = self.table.get(key)
+        if q_state is None:
+            q_state = self.insert(key, {})
+        else:
+            self.touch(key)
+        new_action = action_key not in q_state
+        current_q = q_state.get(action_key, 0)
+        q_state[action_key] = current_q + alpha * (target - current_q)
+        if new_action:
+            size = self.estimate_bytes(key, q_state)
+            self.total_bytes += size - self.entry_bytes[key]
+            self.entry_bytes[key] = size
+            self.evict(key)
+
+    def load_snapshot(self, snapshot):
+        self.table = OrderedDict(snapshot)
+        self.visits = dict.fromkeys(self.table, 1)
+        self.rebuild_heap()
+        self.entry_bytes = {key: self.estimate_bytes(key, q_state) for key, q_state in self.table.items()}
+        self.total_bytes = sum(self.entry_bytes.values())
+
+    # Sauvegarde complète : en plus des valeurs, l'ordre d'utilisation (ordre de la table), les
+    # accès, le tas LFU et les compteurs, pour que les évictions reprennent à l'identique
+    def checkpoint_state(self):
+        arrays, meta = super().checkpoint_state()
+        position = {key: index for index, key in enumerate(self.table)}
+        heap_keys, heap_kind = pack_keys([key for _, _, key in self.heap])
+        counter = next(self.counter)
+        self.counter = itertools.count(counter)  # Lire le compteur l'a avancé
+        arrays.update(
+            visits=np.array([self.visits[key] for key in self.table], dtype=np.int64),
+            visit_order=np.array([position[key] for key in self.visits], dtype=np.int64),
+            entry_bytes=np.array([self.entry_bytes[key] for key in self.table], dtype=np.int64),
+            heap=np.array([(visits, order) for visits, order, _ in self.heap], dtype=np.int64).reshape(-1, 2),
+            heap_keys=heap_keys,
+        )
+        meta.update(heap_kind=heap_kind, counter=counter, total_bytes=self.total_bytes, hits=self.hits,
+                    misses=self.misses, evictions=self.evictions)
+        return arrays, meta
+
+    def load_checkpoint_state(self, arrays, meta):
+        super().load_checkpoint_state(arrays, meta)
+        self.table = OrderedDict(self.table)
+        keys = list(self.table)
+        visits = arrays["visits"].tolist()
+        self.visits = {keys[index]: visits[index] for index in arrays["visit_order"].tolist()}
+        self.entry_bytes = dict(zip(keys, arrays["entry_bytes"].tolist()))
+        heap_keys = unpack_keys(arrays["heap_keys"], meta["heap_kind"])
+        self.heap = [(visits, order, key) for (visits, order), key in zip(arrays["heap"].tolist(), heap_keys)]
+        self.counter = itertools.count(meta["counter"])
+        self.total_bytes = meta["total_bytes"]
+        self.hits, self.misses, self.evictions = meta["hits"], meta["misses"], meta["evictions"]
+
+    # Statistiques de la table : taille, évictions, taux de succès et octets estimés
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.table),
+            "evictions": self.evictions,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes": self.total_bytes,
+            "bytes_per_entry": self.total_bytes / len(self.table) if self.table else 0.0,
+        }
+
+
+# Table Q dense pour un matériel fixé : un tableau float32 [états, pièces * 64 cases d'arrivée]
+# Un état est indexé par les cases de chaque pièce (roi blanc ramené dans le triangle a1-d1-d4
+# pour les finales sans pions) et le trait ; un coup par la pièce qui bouge et sa case d'arrivée.
+class DenseQTable:
+    def __init__(self, max_bytes=2 ** 30):
+        self.max_bytes = max_bytes  # Taille maximale autorisée pour le tableau
+        self.signature = None  # Matériel de la table, fixé par le premier état rencontré
+        self.symmetry = False  # Repliement des 8 symétries (finales sans pions)
+        self.nb_pieces = 0
+        self.values = None  # Tableau des valeurs Q, alloué au premier état rencontré
+        self.visited = None  # États déjà rencontrés
+        self.boards = {}  # FEN -> (indice de l'état, symétrie, case -> pièce), ou None hors signature
+
+    def __len__(self):
+        return 0 if self.visited is None else int(np.count_nonzero(self.visited))
+
+    # Dimensionne et alloue la table à partir du matériel du premier plateau
+    def allocate(self, board):
+        self.signature = material_signature(board)
+        self.symmetry = is_symmetric_material(board)
+        self.nb_pieces = sum(self.signature)
+        nb_king_squares = len(KING_TRIANGLE) if self.symmetry else 64
+        nb_states = nb_king_squares * 64 ** (self.nb_pieces - 1) * 2
+        nb_actions = self.nb_pieces * 64
+        if nb_states * nb_actions * 4 > self.max_bytes:
+            raise ValueError(f"Table dense trop grande pour {self.nb_pieces} pièces ({nb_states} états).")
+        # np.zeros ne réserve la mémoire physique qu'à l'écriture des lignes
+        self.values = np.zeros((nb_states, nb_actions), dtype=np.float32)
+        self.visited = np.zeros(nb_states, dtype=bool)
+
+    # Clé d'un plateau, réutilisable à la place de l'état (None hors de la signature matérielle)
+    def key(self, board):
+        return self.index(board)
+
+    # Identifiant hachable d'un état, commun à toutes ses positions symétriques : sa ligne, None hors
+    # de la signature matérielle
+    def state_id(self, state):
+        indexed = self.index(state)
+        return None if indexed is None else indexed[0]
+
+    # Identifiants de l'état (ligne) et du coup (colonne, -1 si hors table) dans le repère canonique
+    def transition_id(self, state, action):
+        indexed = self.index(state)
+        return None if indexed is None else (indexed[0], int(self.columns(indexed, [action])[0]))
+
+    # Indice de l'état, symétrie appliquée et numéro de pièce par case (-1 si vide)
+    def index(self, state):
+        if state is None or isinstance(state, tuple):  # Déjà indexé
+            return state
+        if isinstance(state, str):
+            if state in self.boards:
+                return self.boards[state]
+            board = chess.Board(state)
+        else:
+            board = state
+        if self.values is None:
+            self.allocate(board)
+
+        indexed = None
+        if material_signature(board) == self.signature:
+            transform = canonical_transform(board) if self.symmetry else 0
+            squares = SQUARE_SYMMETRIES[transform]
+            piece_of_square = np.full(64, -1, dtype=np.int64)
+            index = 0
+            slot = 0
+            for color, piece_type in PIECE_ORDER:
+                for square in sorted(squares[square] for square in chess.scan_forward(board.pieces_mask(piece_type, color))):
+                    if slot == 0 and self.symmetry:
+                        index = TRIANGLE_INDEX[square]
+                    else:
+                        index = index * 64 + square
+                    piece_of_square[square] = slot
+                    slot += 1
+            indexed = (index * 2 + board.turn, transform, piece_of_square)
+
+        if isinstance(state, str):
+            if len(self.boards) >= 200000:
+                self.boards.clear()
+            self.boards[state] = indexed
+        return indexed
+
+    # Colonnes des coups dans le repère de l'état (-1 si aucune pièce sur la case de départ)
+    def columns(self, indexed, actions):
+        _, transform, piece_of_square = indexed
+        squares = SQUARE_SYMMETRIES[transform]
+        from_squares = np.array([squares[action.from_square] for action in actions], dtype=np.int64)
+        to_squares = np.array([squares[action.to_square] for action in actions], dtype=np.int64)
+        slots = piece_of_square[from_squares]
+        return np.where(slots >= 0, slots * 64 + to_squares, -1)
+
+    # Valeurs Q de toutes les actions d'un état, en une lecture vectorisée de la ligne de l'état
+    def q_values(self, state, actions, init=False):
+        indexed = self.index(state)
+        if indexed is None:
+            return np.zeros(len(actions))
+        if init:
+            self.visited[indexed[0]] = True
+        columns = self.columns(indexed, actions)
+        return np.where(columns >= 0, self.values[indexed[0], columns], 0.0)
+
+    def get(self, state, action):
+        return self.q_values(state, [action])[0]
+
+    # Rapproche Q(state, action) de target avec un taux d'apprentissage alpha
+    def update(self, state, action, target, alpha):
+        indexed = self.index(state)
+        if indexed is None:
+            return
+        column = self.columns(indexed, [action])[0]
+        if column < 0:
+            return
+        row = indexed[0]
+        self.visited[row] = True
+        self.values[row, column] += alpha * (target - self.values[row, column])
+
+    # Lignes des états visités, publiables vers un autre processus (voir async_training.py)
+    def snapshot(self):
+        if self.values is None:
+            return None
+        rows = np.flatnonzero(self.visited)
+        return self.signature, self.symmetry, self.values.shape, rows, self.values[rows]
+
+    def load_snapshot(self, snapshot):
+        if snapshot is None:
+            return
+        self.signature, self.symmetry, shape, rows, values = snapshot
+        self.nb_pieces = sum(self.signature)
+        if self.values is None:
+            self.values = np.zeros(shape, dtype=np.float32)
+            self.visited = np.zeros(shape[0], dtype=bool)
+        self.values[rows] = values
+        self.visited[rows] = True
+
+    # Sauvegarde sur disque : lignes des états visités seulement
+    def checkpoint_state(self):
+        if self.values is None:
+            return {}, {}
+        signature, symmetry, shape, rows, values = self.snapshot()
+        return {"rows": rows, "values": values}, {"signature": list(signature), "symmetry": symmetry,
+                                                  "shape": list(shape)}
+
+    def load_checkpoint_state(self, arrays, meta):
+        if meta:
+            self.load_snapshot((tuple(meta["signature"]), meta["symmetry"], tuple(meta["shape"]),
+                                arrays["rows"], arrays["values"]))
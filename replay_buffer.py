@@ -0,0 +1,163 @@
+import numpy as np
+
+
+# Cases remplies des tableaux fields d'une mémoire, pour une sauvegarde (voir checkpoint.py)
+def buffer_state(buffer, fields):
+    arrays = {name: getattr(buffer, name)[:buffer.size] for name in fields}
+    return arrays, {"position": buffer.position, "size": buffer.size}
+
+
+# Recopie une sauvegarde dans une mémoire neuve, élargie si nécessaire
+def load_buffer_state(buffer, fields, arrays, meta):
+    if arrays["next_mask"].shape[1] > buffer.next_mask.shape[1]:
+        buffer.grow(arrays["next_mask"].shape[1])
+    for name in fields:
+        array = arrays[name]
+        getattr(buffer, name)[tuple(slice(length) for length in array.shape)] = array
+    buffer.position, buffer.size = meta["position"], meta["size"]
+
+
+# Mémoire de rejeu à capacité fixe pour le Q-learning approximatif : tableaux NumPy préalloués
+# utilisés comme tampon circulaire (la plus ancienne transition est écrasée quand il est plein).
+# Chaque transition garde les caractéristiques de (état, action), la récompense et les
+# caractéristiques de toutes les actions de l'état suivant, pour que les cibles soient recalculées
+# avec le modèle courant au moment de la mise à jour plutôt qu'au moment de l'ajout.
+# - prioritized : tirage proportionnel à |erreur TD| ** priority_alpha, corrigé par des poids
+#   d'importance d'exposant priority_beta
+class ReplayBuffer:
+    FIELDS = ("features", "rewards", "next_features", "next_mask", "priorities")  # Tableaux sauvegardés
+
+    def __init__(self, capacity, nb_features, max_actions=64, prioritized=False, priority_alpha=0.6,
+                 priority_beta=0.4, priority_epsilon=1e-3):
+        self.capacity = capacity
+        self.nb_features = nb_features
+        self.prioritized = prioritized
+        self.priority_alpha = priority_alpha
+        self.priority_beta = priority_beta
+        self.priority_epsilon = priority_epsilon  # Priorité minimale : aucune transition n'est jamais ignorée
+
+        self.features = np.zeros((capacity, nb_features), dtype=np.float32)
+        self.rewards = np.zeros(capacity)
+        self.next_features = np.zeros((capacity, max_actions, nb_features), dtype=np.float32)
+        self.next_mask = np.zeros((capacity, max_actions), dtype=bool)  # Actions réelles de l'état suivant
+        self.priorities = np.zeros(capacity)
+        self.max_priority = 1.0  # Priorité donnée aux nouvelles transitions
+        self.position = 0  # Prochaine case écrite
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    # Élargit les tableaux de l'état suivant si un état a plus d'actions que prévu
+    def grow(self, max_actions):
+        extra = max_actions - self.next_mask.shape[1]
+        self.next_features = np.pad(self.next_features, ((0, 0), (0, extra), (0, 0)))
+        self.next_mask = np.pad(self.next_mask, ((0, 0), (0, extra)))
+
+    # Ajoute une transition ; next_features est vide si l'état suivant est terminal
+    def add(self, features, reward, next_features):
+        next_features = np.asarray(next_features, dtype=np.float32).reshape(-1, self.nb_features)
+        if len(next_features) > self.next_mask.shape[1]:
+            self.grow(len(next_features))
+
+        i = self.position
+        self.features[i] = features
+        self.rewards[i] = reward
+        self.next_features[i, :len(next_features)] = next_features
+        self.next_features[i, len(next_features):] = 0
+        self.next_mask[i] = False
+        self.next_mask[i, :len(next_features)] = True
+        # Une nouvelle transition reçoit la priorité maximale pour être rejouée au moins une fois
+        self.priorities[i] = self.max_priority
+
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    # Tire un minibatch ; retourne les indices et les poids d'importance (tous à 1 en tirage uniforme)
+    def sample(self, batch_size):
+        if not self.prioritized:
+            return np.random.randint(self.size, size=batch_size), np.ones(batch_size)
+        probabilities = self.priorities[:self.size] ** self.priority_alpha
+        probabilities /= probabilities.sum()
+        indices = np.random.choice(self.size, size=batch_size, p=probabilities)
+        weights = (self.size * probabilities[indices]) ** -self.priority_beta
+        return indices, weights / weights.max()
+
+    # Cibles r + gamma * max Q(s', a') des transitions choisies, en un seul appel à predict
+    # predict reçoit une matrice de caractéristiques et retourne une valeur par ligne
+    def targets(self, indices, predict, gamma):
+        next_features = self.next_features[indices]
+        mask = self.next_mask[indices]
+        next_q = predict(next_features.reshape(-1, self.nb_features)).reshape(mask.shape)
+        next_q = np.where(mask, next_q, -np.inf).max(axis=1)
+        return self.rewards[indices] + gamma * np.where(mask.any(axis=1), next_q, 0.0)
+
+    # Nouvelles priorités après calcul des erreurs TD
+    def update_priorities(self, indices, errors):
+        self.priorities[indices] = np.abs(errors) + self.priority_epsilon
+        self.max_priority = max(self.max_priority, self.priorities[indices].max())
+
+    def checkpoint_state(self):
+        arrays, meta = buffer_state(self, self.FIELDS)
+        meta["max_priority"] = float(self.max_priority)
+        return arrays, meta
+
+    def load_checkpoint_state(self, arrays, meta):
+        load_buffer_state(self, self.FIELDS, arrays, meta)
+        self.max_priority = meta["max_priority"]
+
+
+# Variante compacte pour le réseau de neurones (agent_deep_q_learning.py) : un plateau est gardé
+# sous forme de plans binaires (uint8) et un coup par ses cases de départ et d'arrivée, plutôt
+# qu'une ligne de caractéristiques par action. Tirage uniforme uniquement.
+class BoardReplayBuffer:
+    FIELDS = ("planes", "moves", "rewards", "next_planes", "next_moves", "next_mask")  # Tableaux sauvegardés
+
+    def __init__(self, capacity, nb_inputs, max_actions=64):
+        self.capacity = capacity
+        self.planes = np.zeros((capacity, nb_inputs), dtype=np.uint8)
+        self.moves = np.zeros((capacity, 2), dtype=np.int64)  # Cases de départ et d'arrivée
+        self.rewards = np.zeros(capacity)
+        self.next_planes = np.zeros((capacity, nb_inputs), dtype=np.uint8)
+        self.next_moves = np.zeros((capacity, max_actions, 2), dtype=np.int64)
+        self.next_mask = np.zeros((capacity, max_actions), dtype=bool)  # Coups réels de l'état suivant
+        self.position = 0  # Prochaine case écrite
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    # Élargit les tableaux de l'état suivant si un état a plus de coups que prévu
+    def grow(self, max_actions):
+        extra = max_actions - self.next_mask.shape[1]
+        self.next_moves = np.pad(self.next_moves, ((0, 0), (0, extra), (0, 0)))
+        self.next_mask = np.pad(self.next_mask, ((0, 0), (0, extra)))
+
+    # Ajoute une transition ; next_moves est vide si l'état suivant est terminal
+    def add(self, planes, move, reward, next_planes, next_moves):
+        next_moves = np.asarray(next_moves, dtype=np.int64).reshape(-1, 2)
+        if len(next_moves) > self.next_mask.shape[1]:
+            self.grow(len(next_moves))
+
+        i = self.position
+        self.planes[i] = planes
+        self.moves[i] = move
+        self.rewards[i] = reward
+        self.next_planes[i] = next_planes
+        self.next_moves[i, :len(next_moves)] = next_moves
+        self.next_moves[i, len(next_moves):] = 0
+        self.next_mask[i] = False
+        self.next_mask[i, :len(next_moves)] = True
+
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    # Indices d'un minibatch tiré uniformément
+    def sample(self, batch_size):
+        return np.random.randint(self.size, size=batch_size)
+
+    def checkpoint_state(self):
+        return buffer_state(self, self.FIELDS)
+
+    def load_checkpoint_state(self, arrays, meta):
+        load_buffer_state(self, self.FIELDS, arrays, meta)
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import os
+from chess_board_loader import load_positions_from_file
+from experiment_runner import AGENT_CONFIGURATIONS, run_experiment
+
+
+# Empreinte du contenu d'un fichier de positions : le cache est invalidé si le fichier change
+def file_hash(file_name):
+    with open(file_name, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+# Cache des résultats d'expériences, adressé par le contenu : fichier de positions, type d'agent,
+# hyperparamètres, nombres d'épisodes et graine. Chaque expérience est stockée dans <clé>.json ;
+# une expérience interrompue reprend depuis <clé>.jsonl (voir experiment_runner.run_experiment).
+# Avec checkpoint_every (en secondes), les agents en cours sont aussi sauvegardés dans checkpoints/
+# et une expérience interrompue reprend depuis leur dernière sauvegarde (voir checkpoint.py).
+class ResultsCache:
+    def __init__(self, directory="results_cache", workers=1, seed=None, checkpoint_every=None):
+        self.directory = directory
+        self.workers = workers  # Nombre de processus pour les expériences à calculer
+        self.seed = seed  # Graine utilisée par défaut
+        self.checkpoint_every = checkpoint_every  # Intervalle minimal entre deux sauvegardes (None : aucune)
+        os.makedirs(directory, exist_ok=True)
+
+    # Clé d'une expérience
+    def key(self, fen_file, agent_class, episodes, nb_episodes, agent_configurations, seed):
+        description = json.dumps({
+            "fen_file": file_hash(fen_file), "agent": agent_class.__name__,
+            "configurations": agent_configurations, "episodes": episodes,
+            "nb_episodes": nb_episodes, "seed": seed,
+        }, sort_keys=True)
+        return hashlib.sha256(description.encode()).hexdigest()[:24]
+
+    # Retourne les résultats de l'expérience, en la lançant seulement si elle n'est pas en cache
+    def get(self, fen_file, agent_class, episodes, nb_episodes, agent_configurations=AGENT_CONFIGURATIONS,
+            seed="default"):
+        seed = self.seed if seed == "default" else seed
+        key = self.key(fen_file, agent_class, episodes, nb_episodes, agent_configurations, seed)
+        path = os.path.join(self.directory, key + ".json")
+        if os.path.exists(path):
+            with open(path) as file:
+                return json.load(file)
+
+        mates_found_per_agent, games_ended_in_50_moves = run_experiment(
+            agent_class, load_positions_from_file(fen_file), episodes, nb_episodes, agent_configurations,
+            workers=self.workers, seed=seed, results_file=os.path.join(self.directory, key + ".jsonl"),
+            checkpoint_dir=None if self.checkpoint_every is None else os.path.join(self.directory, "checkpoints"),
+            checkpoint_every=self.checkpoint_every or 0.0)
+        results = {
+            "fen_file": fen_file, "agent": agent_class.__name__, "configurations": agent_configurations,
+            "episodes": episodes, "nb_episodes": nb_episodes, "seed": seed,
+            "mates_found_per_agent": mates_found_per_agent, "games_ended_in_50_moves": games_ended_in_50_moves,
+        }
+
+        # Écriture atomique : un fichier .json présent est toujours complet
+        with open(path + ".tmp", "w") as file:
+            json.dump(results, file)
+        os.replace(path + ".tmp", path)
+        return results
+
+    # Nombre de mats trouvés par configuration et par tour, comme make_q_learning_test
+    def mates(self, fen_file, agent_class, episodes, nb_episodes, **kwargs):
+        return self.get(fen_file, agent_class, episodes, nb_episodes, **kwargs)["mates_found_per_agent"]
@@ -0,0 +1,110 @@
+import chess
+import chess.polyglot
+
+# Les 8 symétries du plateau (groupe diédral), exprimées comme transformations de bitboards
+SYMMETRIES = (
+    lambda bb: bb,                                                   # Identité
+    chess.flip_vertical,                                             # Miroir haut/bas
+    chess.flip_horizontal,                                           # Miroir gauche/droite
+    chess.flip_diagonal,                                             # Miroir sur la diagonale a1-h8
+    chess.flip_anti_diagonal,                                        # Miroir sur la diagonale a8-h1
+    lambda bb: chess.flip_vertical(chess.flip_horizontal(bb)),       # Rotation de 180°
+    lambda bb: chess.flip_vertical(chess.flip_diagonal(bb)),         # Rotation de 90°
+    lambda bb: chess.flip_horizontal(chess.flip_diagonal(bb)),       # Rotation de 270°
+)
+
+# Image de chaque case par chacune des symétries : SQUARE_SYMMETRIES[t][case]
+SQUARE_SYMMETRIES = tuple(
+    tuple(chess.lsb(symmetry(chess.BB_SQUARES[square])) for square in chess.SQUARES)
+    for symmetry in SYMMETRIES
+)
+
+# Ordre canonique des pièces : les deux rois d'abord, puis le reste du matériel blanc et noir
+PIECE_ORDER = (
+    (chess.WHITE, chess.KING), (chess.BLACK, chess.KING),
+    (chess.WHITE, chess.QUEEN), (chess.WHITE, chess.ROOK), (chess.WHITE, chess.BISHOP),
+    (chess.WHITE, chess.KNIGHT), (chess.WHITE, chess.PAWN),
+    (chess.BLACK, chess.QUEEN), (chess.BLACK, chess.ROOK), (chess.BLACK, chess.BISHOP),
+    (chess.BLACK, chess.KNIGHT), (chess.BLACK, chess.PAWN),
+)
+
+# Méthodes d'encodage disponibles :
+# - "fen" : la chaîne FEN complète, compteurs de coups compris (comportement d'origine)
+# - "packed" : entier exact, 4 bits de type + 6 bits de case par pièce, sans les compteurs
+# - "zobrist" : hachage Zobrist 64 bits (polyglot), sans les compteurs
+ENCODINGS = ("fen", "packed", "zobrist")
+
+
+# Entier exact décrivant le placement des pièces, vu à travers la symétrie transform
+def pack_placement(board, transform=0):
+    squares = SQUARE_SYMMETRIES[transform]
+    key = 1  # Bit sentinelle pour que le nombre de pièces soit encodé sans ambiguïté
+    for code, (color, piece_type) in enumerate(PIECE_ORDER):
+        for square in sorted(squares[square] for square in chess.scan_forward(board.pieces_mask(piece_type, color))):
+            key = (key << 10) | (code << 6) | square
+    return key
+
+
+# Vrai si les 8 symétries du plateau préservent les règles dans cette position (finales sans pions ni roque)
+def is_symmetric_material(board):
+    return not board.pawns and not board.castling_rights
+
+
+# Indice de la symétrie qui amène la position dans sa forme canonique (placement minimal)
+def canonical_transform(board):
+    if not is_symmetric_material(board):
+        return 0
+    return min(range(len(SYMMETRIES)), key=lambda transform: pack_placement(board, transform))
+
+
+class StateEncoder:
+    def __init__(self, method="fen", symmetry=False, cache_size=200000):
+        if method not in ENCODINGS:
+            raise ValueError("Encodage invalide. Utilisez 'fen', 'packed' ou 'zobrist'.")
+        self.method = method  # Méthode d'encodage des états
+        self.symmetry = symmetry  # Replier les 8 symétries du plateau pour les finales sans pions
+        self.cache_size = cache_size  # Nombre maximal de FEN gardées en cache
+        self.cache = {}  # FEN -> (clé, symétrie)
+
+    # Retourne la clé de l'état (FEN ou chess.Board) et la symétrie utilisée pour la calculer
+    def encode(self, state):
+        if isinstance(state, tuple):  # Déjà encodé (clé fournie par le moteur d'épisodes)
+            return state
+        if self.method == "fen":
+            return (state if isinstance(state, str) else state.fen()), 0
+
+        if isinstance(state, str):
+            encoded = self.cache.get(state)
+            if encoded is None:
+                if len(self.cache) >= self.cache_size:
+                    self.cache.clear()
+                encoded = self.cache[state] = self.encode_board(chess.Board(state))
+            return encoded
+        return self.encode_board(state)
+
+    # Encode un plateau en ignorant les compteurs de demi-coups et de coups
+    def encode_board(self, board):
+        transform = canonical_transform(board) if self.symmetry else 0
+
+        if self.method == "zobrist":
+            if transform:
+                board = board.transform(SYMMETRIES[transform])
+            return chess.polyglot.zobrist_hash(board), transform
+
+        key = pack_placement(board, transform)
+        key = (key << 1) | board.turn
+        key = (key << 4) | self.castling_code(board)
+        key = (key << 7) | (board.ep_square if board.ep_square is not None else 64)
+        return key, transform
+
+    # Code sur 4 bits des droits de roque
+    def castling_code(self, board):
+        return sum(bit for bit, square in zip((1, 2, 4, 8), (chess.H1, chess.A1, chess.H8, chess.A8))
+                   if board.castling_rights & chess.BB_SQUARES[square])
+
+    # Encode un coup dans le repère de la symétrie de l'état : départ * 64 + arrivée (+ promotion * 4096)
+    def encode_move(self, move, transform=0):
+        if self.method == "fen":
+            return move
+        squares = SQUARE_SYMMETRIES[transform]
+        return ((move.promotion or 0) << 12) | (squares[move.from_square] << 6) | squares[move.to_square]
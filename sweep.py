@@ -0,0 +1,220 @@
+import argparse
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from agent_approximate_q_learning import ApproximateQLearningAgent
+from agent_q_learning import QLearningAgent
+from chess_board_loader import load_positions_from_file, sample_positions
+from experiment_runner import job_seed, run_round, seed_everything
+
+AGENT_CLASSES = {"q_learning": QLearningAgent, "approx": ApproximateQLearningAgent}
+METHODS = ("halving", "hyperband")
+# Paramètres du balayage qui ne sont pas passés au constructeur de l'agent : épisodes d'entraînement
+# par tour et décroissance d'epsilon par épisode (voir episode_engine.EPSILON_DECAY)
+SCHEDULE_PARAMETERS = ("episodes", "epsilon_decay")
+DEFAULT_EPISODES = 10
+
+# Espace de recherche par défaut : une liste est un choix, {"low": ..., "high": ...} un intervalle
+# (tirage uniforme, entier si les deux bornes sont entières ; une grille n'accepte que des listes)
+DEFAULT_SPACE = {
+    "alpha": [0.1, 0.3, 0.5],
+    "gamma": [0.7, 0.8, 0.95],
+    "epsilon": [0.1, 0.2, 0.5],
+    "epsilon_decay": [0.99, 0.995, 0.999],
+    "episodes": [5, 10, 20],
+}
+
+
+# Toutes les combinaisons d'un espace de recherche
+def grid_configurations(space):
+    for name, values in space.items():
+        if not isinstance(values, list):
+            raise ValueError(f"Grille invalide pour {name}. Utilisez une liste de valeurs.")
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+# nb_configurations configurations tirées au hasard dans l'espace de recherche
+def random_configurations(space, nb_configurations, rng):
+    def draw(values):
+        if isinstance(values, list):
+            return rng.choice(values)
+        if isinstance(values["low"], int) and isinstance(values["high"], int):
+            return rng.randint(values["low"], values["high"])
+        return rng.uniform(values["low"], values["high"])
+    return [{name: draw(values) for name, values in space.items()} for _ in range(nb_configurations)]
+
+
+def make_agent(agent_class, config):
+    agent = agent_class(**{name: value for name, value in config.items() if name not in SCHEDULE_PARAMETERS})
+    if "epsilon_decay" in config:
+        agent.epsilon_decay = config["epsilon_decay"]
+    return agent
+
+
+# Tâche d'un processus : poursuit l'entraînement de l'agent d'un essai sur une position, des tours
+# start_round à stop_round (exclu) ; l'agent est renvoyé pour être repris au palier suivant
+def run_trial_job(agent_class, config, trial_idx, fen_string, fen_idx, agent, start_round, stop_round, seed):
+    if agent is None:
+        if seed is not None:
+            seed_everything(job_seed(seed, 0, fen_idx, trial_idx))  # Comme experiment_runner.run_agent_job
+        agent = make_agent(agent_class, config)
+    episodes = config.get("episodes", DEFAULT_EPISODES)
+    records = [run_round(agent, fen_string, episodes, seed, round_idx, fen_idx, trial_idx)
+               for round_idx in range(start_round, stop_round)]
+    return agent, records
+
+
+# Amène chaque essai à rounds tours ; comme dans run_experiment, un agent est entraîné par position
+# et les graines des tours dépendent de l'essai, pas du nombre de workers
+def advance_trials(agent_class, trials, fens, rounds, workers, seed):
+    jobs = [
+        (agent_class, trial["config"], trial["trial"], fen_string, fen_idx, trial["agents"][fen_idx],
+         trial["rounds"], rounds, seed)
+        for trial in trials for fen_idx, fen_string in enumerate(fens)
+    ]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run_trial_job, *zip(*jobs)))
+    else:
+        results = [run_trial_job(*job) for job in jobs]
+
+    for job, (agent, records) in zip(jobs, results):
+        trial = next(trial for trial in trials if trial["trial"] == job[2])
+        trial["agents"][job[4]] = agent
+        trial["records"].extend(records)
+    for trial in trials:
+        trial["rounds"] = rounds
+        mates = [0] * rounds
+        for record in trial["records"]:
+            mates[record["round"]] += record["outcome"] == "mate"
+        # Taux de mat du dernier tour joué, départagé par le taux moyen sur tous les tours
+        trial["mate_rate"] = mates[-1] / len(fens)
+        trial["mean_mate_rate"] = sum(mates) / (rounds * len(fens))
+
+
+# Successive halving : tous les essais jouent min_rounds tours, seul le meilleur 1/eta (selon le
+# taux de mat) continue jusqu'à eta fois plus de tours, et ainsi de suite jusqu'à max_rounds tours
+# ou un seul survivant. Retourne tous les essais, éliminés compris, avec le nombre de tours joués.
+def successive_halving(agent_class, configurations, fens, min_rounds=1, max_rounds=None, eta=3, workers=1,
+                       seed=None, first_trial=0, bracket=0):
+    if eta < 2 or min_rounds < 1:
+        raise ValueError("Paramètres invalides. Utilisez eta >= 2 et min_rounds >= 1.")
+    trials = [{"trial": first_trial + i, "bracket": bracket, "config": config, "agents": [None] * len(fens),
+               "rounds": 0, "records": []} for i, config in enumerate(configurations)]
+    survivors = trials
+    rounds = min_rounds if max_rounds is None else min(min_rounds, max_rounds)
+    while survivors:
+        start = time.perf_counter()
+        advance_trials(agent_class, survivors, fens, rounds, workers, seed)
+        print(f"Palier de {rounds} tours : {len(survivors)} essais ({time.perf_counter() - start:.1f} s), "
+              f"meilleur taux de mat {max(trial['mate_rate'] for trial in survivors):.0%}")
+        if len(survivors) == 1 or (max_rounds is not None and rounds >= max_rounds):
+            break
+        survivors.sort(key=lambda trial: (trial["mate_rate"], trial["mean_mate_rate"]), reverse=True)
+        for trial in survivors[max(1, len(survivors) // eta):]:
+            trial["agents"] = None  # Essai arrêté : ses agents ne sont plus utiles
+        survivors = survivors[:max(1, len(survivors) // eta)]
+        rounds = rounds * eta if max_rounds is None else min(rounds * eta, max_rounds)
+    for trial in trials:
+        trial["agents"] = None
+    return trials
+
+
+# Hyperband : plusieurs successive halving (« brackets ») sur des configurations tirées au hasard,
+# du plus agressif (beaucoup d'essais, peu de tours au départ) au plus prudent (peu d'essais,
+# tous jusqu'à max_rounds tours)
+def hyperband(agent_class, space, fens, max_rounds=9, eta=3, workers=1, seed=None):
+    rng = random.Random(seed)
+    s_max = int(math.log(max_rounds, eta) + 1e-9)
+    trials = []
+    for bracket in range(s_max, -1, -1):
+        nb_configurations = math.ceil((s_max + 1) / (bracket + 1) * eta ** bracket)
+        min_rounds = max(1, round(max_rounds / eta ** bracket))
+        print(f"Bracket {bracket} : {nb_configurations} configurations, {min_rounds} tours au départ")
+        trials.extend(successive_halving(agent_class, random_configurations(space, nb_configurations, rng), fens,
+                                         min_rounds, max_rounds, eta, workers, seed, len(trials), bracket))
+    return trials
+
+
+# Classement : les essais ayant joué le plus de tours d'abord, puis par taux de mat
+def leaderboard(trials):
+    ranked = sorted(trials, key=lambda trial: (trial["rounds"], trial["mate_rate"], trial["mean_mate_rate"]),
+                    reverse=True)
+    return [{
+        "rank": rank + 1, "trial": trial["trial"], "bracket": trial["bracket"], "config": trial["config"],
+        "rounds": trial["rounds"], "mate_rate": trial["mate_rate"], "mean_mate_rate": trial["mean_mate_rate"],
+        "train_time": sum(record["train_time"] for record in trial["records"]),
+    } for rank, trial in enumerate(ranked)]
+
+
+def print_leaderboard(rows, limit=10):
+    print(f"{'rang':>4} {'essai':>5} {'tours':>5} {'mats':>6} {'moyenne':>8}  configuration")
+    for row in rows[:limit]:
+        print(f"{row['rank']:>4} {row['trial']:>5} {row['rounds']:>5} {row['mate_rate']:>6.0%} "
+              f"{row['mean_mate_rate']:>8.0%}  {json.dumps(row['config'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recherche d'hyperparamètres avec arrêt précoce des configurations faibles")
+    parser.add_argument("--positions", default="mate_in_one_positions_3_pieces.txt", help="fichier de positions")
+    parser.add_argument("--sample", type=int, help="nombre de positions tirées au hasard dans le fichier")
+    parser.add_argument("--agent", choices=list(AGENT_CLASSES), default="q_learning")
+    parser.add_argument("--method", choices=METHODS, default="halving")
+    parser.add_argument("--search", choices=("grid", "random"), default="random",
+                        help="configurations de successive halving (hyperband tire toujours au hasard)")
+    parser.add_argument("--trials", type=int, default=27, help="nombre de configurations tirées (--search random)")
+    parser.add_argument("--space", help="espace de recherche JSON (par défaut DEFAULT_SPACE)")
+    parser.add_argument("--min-rounds", type=int, default=1, help="tours du premier palier (halving)")
+    parser.add_argument("--max-rounds", type=int, default=9, help="tours maximum d'une configuration")
+    parser.add_argument("--eta", type=int, default=3, help="facteur de réduction entre deux paliers")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", default="sweep_leaderboard.json", help="fichier JSON du classement")
+    args = parser.parse_args(argv)
+
+    space = DEFAULT_SPACE
+    if args.space:
+        with open(args.space) as file:
+            space = json.load(file)
+    if args.sample:
+        fens = sample_positions(args.positions, args.sample, seed=args.seed)
+    else:
+        fens = list(dict.fromkeys(load_positions_from_file(args.positions)))
+    agent_class = AGENT_CLASSES[args.agent]
+
+    start = time.perf_counter()
+    if args.method == "hyperband":
+        trials = hyperband(agent_class, space, fens, args.max_rounds, args.eta, args.workers, args.seed)
+    else:
+        if args.search == "grid":
+            configurations = grid_configurations(space)
+        else:
+            configurations = random_configurations(space, args.trials, random.Random(args.seed))
+        trials = successive_halving(agent_class, configurations, fens, args.min_rounds, args.max_rounds, args.eta,
+                                    args.workers, args.seed)
+
+    # Budget consommé, comparé à celui de toutes les configurations jouées jusqu'à max_rounds tours
+    rounds_played = sum(trial["rounds"] for trial in trials)
+    full_budget = len(trials) * args.max_rounds
+    rows = leaderboard(trials)
+    print_leaderboard(rows)
+    print(f"{rounds_played} tours par position sur {full_budget} sans arrêt précoce "
+          f"({rounds_played / full_budget:.0%}), {time.perf_counter() - start:.1f} s")
+
+    with open(args.output, "w") as file:
+        json.dump({
+            "meta": {"positions": args.positions, "nb_positions": len(fens), "agent": args.agent,
+                     "method": args.method, "search": args.search, "eta": args.eta, "max_rounds": args.max_rounds,
+                     "seed": args.seed, "rounds_played": rounds_played, "full_budget": full_budget},
+            "leaderboard": rows,
+        }, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
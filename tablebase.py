@@ -0,0 +1,205 @@
+import chess
+import numpy as np
+from q_table import KING_TRIANGLE
+from state_encoding import SQUARE_SYMMETRIES
+
+TRIANGLE_POSITION = np.full(64, -1, dtype=np.int64)
+TRIANGLE_POSITION[list(KING_TRIANGLE)] = np.arange(len(KING_TRIANGLE))
+SYMMETRY_TABLES = np.array(SQUARE_SYMMETRIES, dtype=np.int64)  # [symétrie, case] -> case
+
+
+# Table de distance au mat exacte pour roi + une pièce contre roi (KQK, KRK...), calculée par
+# analyse rétrograde vectorisée. Une position est indexée par la case du roi blanc (ramenée dans le
+# triangle a1-d1-d4 par symétrie), celles des autres pièces et le trait.
+# dtm[index] : nombre de demi-coups avant le mat des noirs avec un jeu parfait, -1 si pas de gain
+class Tablebase:
+    def __init__(self, allowed_pieces, dtm=None):
+        self.allowed_pieces = list(allowed_pieces)
+        self.check_material()
+        # Ordre interne des pièces : roi blanc, roi noir, puis la pièce blanche
+        self.order = [self.allowed_pieces.index((chess.KING, chess.WHITE)),
+                      self.allowed_pieces.index((chess.KING, chess.BLACK))]
+        self.order += [i for i in range(len(self.allowed_pieces)) if i not in self.order]
+        self.pieces = [chess.Piece(*self.allowed_pieces[i]) for i in self.order]
+        self.nb_states = len(KING_TRIANGLE) * 64 ** (len(self.pieces) - 1) * 2
+        self.dtm = dtm if dtm is not None else self.solve()
+
+    # Seules les finales roi + une pièce sans pion contre roi seul sont exactes : la seule prise
+    # possible (le roi noir prend la pièce) mène à une nulle
+    def check_material(self):
+        pieces = sorted(self.allowed_pieces)
+        others = [piece for piece in pieces if piece[0] != chess.KING]
+        if (len(pieces) != 3 or (chess.KING, chess.WHITE) not in pieces or (chess.KING, chess.BLACK) not in pieces
+                or others[0][1] != chess.WHITE or others[0][0] == chess.PAWN):
+            raise ValueError("Table de finales disponible uniquement pour roi + une pièce contre roi (KQK, KRK...).")
+
+    # Indices canoniques de positions données par leurs cases [positions, pièces] (ordre interne) et le trait
+    def indices(self, squares, turns):
+        squares = np.asarray(squares, dtype=np.int64)
+        nb_pieces = squares.shape[1]
+        weights = 64 ** np.arange(nb_pieces - 1, -1, -1)
+        images = SYMMETRY_TABLES[:, squares]  # [symétrie, positions, pièces]
+        best = np.argmin(images @ weights, axis=0)  # Placement minimal : roi blanc dans le triangle
+        canonical = images[best, np.arange(len(squares))]
+        index = TRIANGLE_POSITION[canonical[:, 0]]
+        for piece in range(1, nb_pieces):
+            index = index * 64 + canonical[:, piece]
+        return index * 2 + np.asarray(turns, dtype=np.int64)
+
+    # Cases (ordre interne) d'un plateau, ou None si le matériel n'est pas celui de la table
+    def board_squares(self, board):
+        squares = []
+        for piece in self.pieces:
+            mask = board.pieces_mask(piece.piece_type, piece.color)
+            if chess.popcount(mask) != 1:
+                return None
+            squares.append(chess.lsb(mask))
+        if chess.popcount(board.occupied) != len(self.pieces):
+            return None
+        return squares
+
+    # Construit le graphe des coups puis propage les mats en arrière, une profondeur à la fois
+    def solve(self):
+        board = chess.Board(None)
+        valid = np.zeros(self.nb_states, dtype=bool)
+        mated = np.zeros(self.nb_states, dtype=bool)
+        edge_sources, edge_squares, edge_turns, edge_captures = [], [], [], []
+        nb_others = len(self.pieces) - 1
+
+        for white_king in KING_TRIANGLE:
+            for others in np.ndindex(*(64,) * nb_others):
+                squares = (white_king,) + others
+                if len(set(squares)) != len(squares):
+                    continue
+                for turn in (chess.BLACK, chess.WHITE):
+                    board.set_piece_map(dict(zip(squares, self.pieces)))
+                    board.turn = turn
+                    if not board.is_valid():
+                        continue
+                    state = int(self.indices([squares], [turn])[0])
+                    if valid[state]:
+                        continue  # Image par symétrie d'une position déjà analysée
+                    valid[state] = True
+                    moves = list(board.legal_moves)
+                    if not moves:
+                        mated[state] = board.is_check()
+                    for move in moves:
+                        successor = list(squares)
+                        successor[squares.index(move.from_square)] = move.to_square
+                        edge_sources.append(state)
+                        edge_captures.append(move.to_square in squares)
+                        edge_squares.append(successor)
+                        edge_turns.append(not turn)
+
+        sources = np.array(edge_sources, dtype=np.int64)
+        targets = self.indices(np.array(edge_squares), np.array(edge_turns))
+        targets[np.array(edge_captures, dtype=bool)] = -1  # La prise de la pièce blanche mène à une nulle
+        return self.retrograde(valid, mated, sources, targets)
+
+    # Analyse rétrograde sur les arêtes (sources -> targets), -1 pour une cible nulle
+    def retrograde(self, valid, mated, sources, targets):
+        dtm = np.full(self.nb_states, -1, dtype=np.int16)
+        black_to_move = np.arange(self.nb_states) % 2 == 0
+        dtm[mated & black_to_move] = 0
+        nb_moves = np.bincount(sources, minlength=self.nb_states)
+        depth = 0
+        stalled = 0
+
+        # Arrêt quand ni les blancs ni les noirs n'ont de nouvelle position résolue
+        while stalled < 2:
+            depth += 1
+            target_dtm = np.where(targets >= 0, dtm[np.maximum(targets, 0)], -1)
+            if depth % 2:
+                # Blancs au trait : gagné dès qu'un coup mène à une position perdue en depth - 1
+                new = np.zeros(self.nb_states, dtype=bool)
+                new[sources[target_dtm == depth - 1]] = True
+                new &= valid & ~black_to_move & (dtm < 0)
+            else:
+                # Noirs au trait : perdu quand tous les coups mènent à une position gagnée par les blancs
+                nb_won = np.bincount(sources[target_dtm >= 0], minlength=self.nb_states)
+                new = valid & black_to_move & (dtm < 0) & (nb_moves > 0) & (nb_won == nb_moves)
+            dtm[new] = depth
+            stalled = 0 if new.any() else stalled + 1
+        return dtm
+
+    # Distance au mat d'un plateau (FEN ou chess.Board) en demi-coups, -1 si pas de gain, None hors table
+    def probe(self, state):
+        board = chess.Board(state) if isinstance(state, str) else state
+        squares = self.board_squares(board)
+        if squares is None:
+            return None
+        return int(self.dtm[self.indices([squares], [board.turn])[0]])
+
+    # Coups blancs qui rapprochent le plus vite du mat dans une position gagnante
+    def best_moves(self, state):
+        board = chess.Board(state) if isinstance(state, str) else state
+        dtm = self.probe(board)
+        if dtm is None or dtm <= 0 or board.turn != chess.WHITE:
+            return []
+        moves = []
+        for move in board.legal_moves:
+            board.push(move)
+            if board.is_checkmate() or self.probe(board) == dtm - 1:
+                moves.append(move)
+            board.pop()
+        return moves
+
+    # Tire des positions gagnantes (blancs au trait), au plus max_dtm demi-coups du mat si précisé
+    def sample_wins(self, k, max_dtm=None, seed=None):
+        winning = np.flatnonzero((self.dtm > 0) & (np.arange(self.nb_states) % 2 == 1)
+                                 & ((self.dtm <= max_dtm) if max_dtm is not None else True))
+        rng = np.random.default_rng(seed)
+        fen_strings = []
+        for index in rng.choice(winning, size=min(k, len(winning)), replace=False):
+            index //= 2
+            squares = []
+            for _ in range(len(self.pieces) - 1):
+                squares.append(index % 64)
+                index //= 64
+            squares.append(KING_TRIANGLE[index])
+            board = chess.Board(None)
+            board.set_piece_map(dict(zip(reversed(squares), self.pieces)))
+            fen_strings.append(board.board_fen() + " w - - 0 1")
+        return fen_strings
+
+    # Sauvegarde et rechargement de la table
+    def save(self, file_name):
+        np.savez_compressed(file_name, dtm=self.dtm)
+
+    @classmethod
+    def load(cls, file_name, allowed_pieces):
+        return cls(allowed_pieces, np.load(file_name)["dtm"])
+
+
+# Part des positions gagnantes où l'agent joue un coup optimal selon la table (évaluation instantanée)
+def optimal_move_rate(agent, tablebase, fen_strings):
+    optimal = total = 0
+    for fen_string in fen_strings:
+        board = chess.Board(fen_string)
+        best = tablebase.best_moves(board)
+        if not best:
+            continue
+        total += 1
+        optimal += agent.get_best_move(fen_string, list(board.legal_moves)) in best
+    return optimal / total if total else 0.0
+
+
+# Valeur Q d'un coup qui laisse le mat à plies_to_mate demi-coups, avec les récompenses de
+# l'entraînement (-1 par demi-coup, +100 au mat)
+def mate_value(plies_to_mate, gamma):
+    return 100 * gamma ** plies_to_mate - (1 - gamma ** plies_to_mate) / (1 - gamma)
+
+
+# Démarrage à chaud : initialise la table Q d'un QLearningAgent sur les positions données
+# à partir des distances au mat des positions atteintes par chaque coup blanc
+def warm_start(agent, tablebase, fen_strings):
+    for fen_string in fen_strings:
+        board = chess.Board(fen_string)
+        if tablebase.probe(board) is None or board.turn != chess.WHITE:
+            continue
+        for move in list(board.legal_moves):
+            board.push(move)
+            dtm = 0 if board.is_checkmate() else tablebase.probe(board)
+            board.pop()
+            if dtm is not None and dtm >= 0:
+                agent.Q.update(fen_string, move, mate_value(dtm, agent.gamma), 1.0)
@@ -0,0 +1,80 @@
+from collections import OrderedDict, namedtuple
+
+# Informations d'une position qui ne dépendent pas de l'historique de la partie
+PositionInfo = namedtuple("PositionInfo", ["legal_moves", "is_checkmate", "is_stalemate", "is_insufficient_material"])
+
+
+# Clé d'une position : pièces, trait, roques et prise en passant jouable, sans l'historique.
+# Seul point d'accès à la méthode privée de python-chess ; si elle disparaît, la clé est construite
+# avec l'API publique (même égalité, un peu plus lente).
+def transposition_key(board):
+    if hasattr(board, "_transposition_key"):
+        return board._transposition_key()
+    return (board.board_fen(), board.turn, board.clean_castling_rights(),
+            board.ep_square if board.has_legal_en_passant() else None)
+
+
+class TranspositionCache:
+    def __init__(self, max_size=200000):
+        self.max_size = max_size  # Nombre maximal de positions gardées (les moins récemment utilisées sont évincées)
+        self.entries = OrderedDict()  # clé de position -> PositionInfo
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Retourne les informations de la position, calculées une seule fois tant qu'elle reste en cache
+    def probe(self, board):
+        key = transposition_key(board)
+        info = self.entries.get(key)
+        if info is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return info
+
+        self.misses += 1
+        legal_moves = tuple(board.legal_moves)
+        in_check = board.is_check()
+        info = PositionInfo(
+            legal_moves,
+            in_check and not legal_moves,
+            not in_check and not legal_moves,
+            board.is_insufficient_material(),
+        )
+        self.entries[key] = info
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return info
+
+    # Coups légaux, dans l'ordre de génération de python-chess
+    def legal_moves(self, board):
+        return list(self.probe(board).legal_moves)
+
+    def is_checkmate(self, board):
+        return self.probe(board).is_checkmate
+
+    def is_stalemate(self, board):
+        return self.probe(board).is_stalemate
+
+    # Même résultat que board.is_game_over() : les règles liées à l'historique
+    # (75 coups, quintuple répétition) sont vérifiées sur le plateau lui-même
+    def is_game_over(self, board):
+        info = self.probe(board)
+        if not info.legal_moves or info.is_insufficient_material:
+            return True
+        return board.is_seventyfive_moves() or board.is_fivefold_repetition()
+
+    # Statistiques du cache : taille, succès, échecs et taux de succès
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Un cache par processus, partagé par ChessBoard, le moteur d'épisodes et les agents
+default_cache = TranspositionCache()
@@ -0,0 +1,158 @@
+import numpy as np
+from chess_board import ChessBoard
+from episode_engine import EPSILON_DECAY
+from transposition_cache import transposition_key
+
+
+class VectorChessEnv:
+    # fens : positions de départ, la partie i démarre sur fens[i % len(fens)]
+    # state_key : fonction plateau -> état, typiquement agent.state_key (FEN par défaut)
+    # opponent : None si l'agent joue les deux camps (entraînement), "random" pour répondre au hasard (évaluation)
+    # auto_reset : relancer automatiquement les parties terminées
+    def __init__(self, fens, nb_envs=None, state_key=None, opponent=None, auto_reset=True):
+        if opponent not in (None, "random"):
+            raise ValueError("Adversaire invalide. Utilisez None ou 'random'.")
+        self.fens = list(fens)
+        self.nb_envs = nb_envs or len(self.fens)
+        self.state_key = state_key or (lambda board: board.fen())
+        self.opponent = opponent
+        self.auto_reset = auto_reset
+        self.boards = [ChessBoard(self.fens[i % len(self.fens)]) for i in range(self.nb_envs)]
+        self.histories = [set() for _ in range(self.nb_envs)]  # Positions vues pendant la partie en cours
+        self.active = np.ones(self.nb_envs, dtype=bool)  # Parties encore en cours (sans auto_reset)
+        self.states = [None] * self.nb_envs  # État courant de chaque partie
+
+    # Remet toutes les parties sur leur position de départ et retourne leurs états
+    def reset(self):
+        for i in range(self.nb_envs):
+            self.reset_env(i)
+        self.active[:] = True
+        return list(self.states)
+
+    # Ramène la partie i sur sa position de départ avec pop(), sans relire la FEN
+    def reset_env(self, i):
+        board = self.boards[i].board
+        while board.move_stack:
+            board.pop()
+        self.histories[i].clear()
+        self.states[i] = self.state_key(board)
+
+    # Coups légaux de chaque partie (liste vide pour une partie terminée)
+    def legal_moves(self):
+        return [self.boards[i].get_possible_moves() if self.active[i] else [] for i in range(self.nb_envs)]
+
+    # Joue une action par partie active et retourne (états suivants, récompenses, fins de partie, infos)
+    # Les récompenses et règles d'arrêt sont celles de l'entraînement (voir episode_engine.py) ;
+    # infos["repetition"] marque les transitions coupées par une répétition, qui ne sont pas apprises,
+    # et infos["outcomes"] vaut "mate" ou "fifty" comme dans les parties d'évaluation.
+    def step(self, actions):
+        next_states = [None] * self.nb_envs
+        rewards = np.zeros(self.nb_envs)
+        dones = np.zeros(self.nb_envs, dtype=bool)
+        repetitions = np.zeros(self.nb_envs, dtype=bool)
+        outcomes = [None] * self.nb_envs
+
+        for i, action in enumerate(actions):
+            if not self.active[i]:
+                continue
+            chess_board = self.boards[i]
+            chess_board.apply_move(action)
+            reward, outcome = self.check(i)
+
+            # L'adversaire aléatoire répond si la partie continue
+            if self.opponent == "random" and outcome is None:
+                chess_board.play_random_move()
+                if chess_board.is_check_mate() or chess_board.is_game_over():
+                    reward, outcome = 100, "mate"
+
+            rewards[i] = reward
+            outcomes[i] = outcome
+            repetitions[i] = outcome == "repetition"
+            dones[i] = outcome is not None
+            next_states[i] = self.state_key(chess_board.board)
+            self.states[i] = next_states[i]
+
+            if dones[i]:
+                if self.auto_reset:
+                    self.reset_env(i)
+                else:
+                    self.active[i] = False
+
+        return next_states, rewards, dones, {"repetition": repetitions, "outcomes": outcomes}
+
+    # Récompense et issue de la partie i après un coup de l'agent
+    def check(self, i):
+        chess_board = self.boards[i]
+
+        # Règles des parties d'évaluation : pas de détection de répétition, le mat est vérifié en premier
+        if self.opponent == "random":
+            if chess_board.is_check_mate() or chess_board.is_game_over():
+                return 100, "mate"
+            if chess_board.get_is_fifty_moves():
+                return -50, "fifty"
+            return -1, None
+
+        board = chess_board.board
+        position_hash = (transposition_key(board), board.halfmove_clock, board.fullmove_number)
+        if position_hash in self.histories[i]:
+            return -10, "repetition"  # Pénalité pour répétition
+        self.histories[i].add(position_hash)
+
+        if chess_board.get_is_fifty_moves():
+            return -50, "fifty"  # Pénalité pour la règle des 50 coups
+        if chess_board.is_game_over():
+            return 100, "mate"  # Récompense positive pour la victoire
+        return -1, None
+
+
+# Entraîne un agent sur plusieurs parties jouées en parallèle jusqu'à avoir terminé episodes parties
+# La table Q ou le modèle est mis à jour une fois par lot de demi-coups
+def train_vectorized(agent, fens, episodes, nb_envs=None):
+    env = VectorChessEnv(fens, nb_envs=nb_envs, state_key=agent.state_key)
+    states = env.reset()
+    finished = 0
+    decay = getattr(agent, "epsilon_decay", EPSILON_DECAY)
+
+    while finished < episodes:
+        possible_actions = env.legal_moves()
+        actions = agent.choose_actions(states, possible_actions)
+        next_states, rewards, dones, infos = env.step(actions)
+
+        learn = ~infos["repetition"]
+        agent.update_q_batch(
+            [state for state, keep in zip(states, learn) if keep],
+            [action for action, keep in zip(actions, learn) if keep],
+            rewards[learn],
+            [state for state, keep in zip(next_states, learn) if keep],
+            [moves for moves, keep in zip(possible_actions, learn) if keep],
+        )
+
+        # Décrémenter epsilon pour chaque partie terminée
+        for _ in range(int(np.count_nonzero(dones))):
+            agent.epsilon = max(0.01, agent.epsilon * decay)
+        finished += int(np.count_nonzero(dones))
+        states = list(env.states)
+
+
+# Évalue un agent contre un adversaire aléatoire sur toutes les positions à la fois
+# Retourne l'issue ("mate" ou "fifty") de la partie jouée depuis chaque FEN
+def evaluate_vectorized(agent, fens, instrumentation=None):
+    env = VectorChessEnv(fens, state_key=agent.state_key, opponent="random", auto_reset=False)
+    if instrumentation is not None:
+        agent, env = instrumentation.wrap_vector_evaluation(agent, env)
+    states = env.reset()
+    outcomes = [None] * env.nb_envs
+
+    while env.active.any():
+        possible_actions = env.legal_moves()
+        active = [i for i in range(env.nb_envs) if env.active[i]]
+        best_moves = agent.get_best_moves([states[i] for i in active], [possible_actions[i] for i in active])
+        actions = [None] * env.nb_envs
+        for i, move in zip(active, best_moves):
+            actions[i] = move
+        states, _, dones, infos = env.step(actions)
+        for i in active:
+            if dones[i]:
+                outcomes[i] = infos["outcomes"][i]
+
+    return outcomes